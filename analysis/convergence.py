@@ -3,7 +3,7 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import warnings
-from core_pricer import input_parameters, run_backward_pricing, run_recursive_pricing, run_black_scholes
+from core_pricer import input_parameters, run_backward_price_only, run_recursive_pricing, run_black_scholes
 from utils.utils_sheet import ensure_sheet
 from utils.utils_tree_error import tree_error
 warnings.filterwarnings("ignore", category=RuntimeWarning)
@@ -41,7 +41,7 @@ def outil_convergence_excel():
     data = []
     for n in N_values:
         if method == "Backward":
-            price, _, _ = run_backward_pricing(market, option, n, exercise, optimize, threshold)
+            price, _ = run_backward_price_only(market, option, n, exercise, optimize, threshold)
         else:
             price, _, _ = run_recursive_pricing(market, option, N, exercise, optimize, threshold)
 
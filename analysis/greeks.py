@@ -1,6 +1,5 @@
 import sys
 import os
-import copy
 import numpy as np
 
 # -------------------------------------------------------------------------
@@ -10,104 +9,166 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from core_pricer import (
     input_parameters,
-    run_backward_pricing,
+    run_adjoint_pricing,
+    run_backward_price_only,
+    run_lattice_greeks,
     run_recursive_pricing,
+    run_scenario_pricing,
 )
+from models.pricing_context import PricingContext
 from utils.utils_bs import bs_greeks
-from utils.utils_grecs import OneDimDerivative
+from utils.utils_constants import GREEK_LEAD_STEPS
+from utils.utils_grecs import MultiDimDerivative
 
 
 # -------------------------------------------------------------------------
 # 1. Fonction générique : récupération du prix selon la méthode
 # -------------------------------------------------------------------------
-def get_price(market, option, N, exercise, optimize, threshold, method):
-    """Retourne le prix de l’option selon la méthode choisie."""
-    pricing_fn = run_backward_pricing if method.lower() == "backward" else run_recursive_pricing
-    price, _, _ = pricing_fn(market, option, N, exercise, optimize, threshold)
-    return float(price)
-
-
-# -------------------------------------------------------------------------
-# 2. Wrapper générique pour dérivées numériques
-# -------------------------------------------------------------------------
-def greek_wrapper(params, x: float) -> float:
+def get_price(market, option, N, exercise, optimize, threshold, method, context=None):
     """
-    Modifie un paramètre de marché pour recalculer le prix.
-    Utilisé pour la dérivation numérique.
+    Retourne le prix de l’option selon la méthode choisie.
+    context : PricingContext réutilisé par la méthode backward.
     """
-    market, option, N, exercise, optimize, threshold, target, method = params
-    m = copy.deepcopy(market)
-    setattr(m, target, x)
-    return get_price(m, option, N, exercise, optimize, threshold, method)
+    if method.lower() == "backward":
+        price, _ = run_backward_price_only(market, option, N, exercise, optimize, threshold,
+                                           context=context)
+    else:
+        price, _, _ = run_recursive_pricing(market, option, N, exercise, optimize, threshold)
+    return float(price)
 
 
 # -------------------------------------------------------------------------
-# 3. Dérivées croisées : Vanna & Vomma
+# 2. Grecs par scénarios : tous les bumps en un seul appel compilé
 # -------------------------------------------------------------------------
-def finite_diff_2d(market, option, N, exercise, optimize, threshold, method, base_price):
+def batch_greeks(market, option, N, exercise, optimize, threshold):
     """
-    Calcule Vanna (∂²V / ∂S∂σ) et Vomma (∂²V / ∂σ²) par différences finies centrées.
+    Calcule les mêmes grecs que compute_method_greeks (mêmes incréments,
+    méthode backward) à partir d’un seul vecteur de prix : les 13 marchés
+    bumpés sont construits et pricés par un unique appel à
+    run_scenario_pricing.
     """
     S0, sigma0 = market.S0, market.sigma
-    hS = max(1e-5, 0.01 * S0)
+    hS = max(1e-5, 0.005 * S0)
     hSigma = max(1e-5, 0.005)
+    hR = 1e-4
+    hT = 1.0 / 365.0  # un jour
+    hS2 = max(1e-5, 0.01 * S0)   # Pas en S des dérivées croisées
+
+    scenarios = [
+        {},
+        {"S0": S0 + hS}, {"S0": S0 - hS},
+        {"sigma": sigma0 + hSigma}, {"sigma": max(1e-6, sigma0 - hSigma)},
+        {"r": market.r + hR}, {"r": market.r - hR},
+        {"T": market.T + hT}, {"T": market.T - hT},
+        {"S0": S0 + hS2, "sigma": sigma0 + hSigma}, {"S0": S0 + hS2, "sigma": max(1e-6, sigma0 - hSigma)},
+        {"S0": S0 - hS2, "sigma": sigma0 + hSigma}, {"S0": S0 - hS2, "sigma": max(1e-6, sigma0 - hSigma)},
+    ]
+    prices, _ = run_scenario_pricing(market, option, N, exercise, scenarios, optimize, threshold)
+    (base, s_up, s_down, sig_up, sig_down, r_up, r_down, t_up, t_down,
+     p_up_up, p_up_down, p_down_up, p_down_down) = (float(p) for p in prices)
+
+    vanna = (p_up_up - p_up_down - p_down_up + p_down_down) / (4 * hS2 * hSigma)
+    vomma = (sig_up - 2 * base + sig_down) / (hSigma ** 2)
 
-    def price_shift(dS=0.0, dSigma=0.0):
-        m = copy.deepcopy(market)
-        m.S0 = S0 + dS
-        m.sigma = max(1e-6, sigma0 + dSigma)
-        return get_price(m, option, N, exercise, optimize, threshold, method)
-
-    # --- Calcul des dérivées croisées
-    p_up_up     = price_shift(+hS, +hSigma)
-    p_up_down   = price_shift(+hS, -hSigma)
-    p_down_up   = price_shift(-hS, +hSigma)
-    p_down_down = price_shift(-hS, -hSigma)
-
-    vanna = (p_up_up - p_up_down - p_down_up + p_down_down) / (4 * hS * hSigma)
-
-    # --- Calcul de Vomma
-    p_sig_up   = price_shift(0.0, +hSigma)
-    p_sig_down = price_shift(0.0, -hSigma)
-    vomma = (p_sig_up - 2 * base_price + p_sig_down) / (hSigma ** 2)
-
-    # Sécurité numérique
-    if not np.isfinite(vanna): vanna = 0.0
-    if not np.isfinite(vomma): vomma = 0.0
-
-    return float(vanna), float(vomma)
+    return {
+        "Delta": (s_up - s_down) / (2 * hS),
+        "Gamma": (s_up - 2 * base + s_down) / (hS ** 2),
+        "Vega": (sig_up - sig_down) / (2 * hSigma),
+        "Theta": -(t_up - t_down) / (2 * hT),
+        "Rho": (r_up - r_down) / (2 * hR),
+        "Vanna": vanna if np.isfinite(vanna) else 0.0,
+        "Vomma": vomma if np.isfinite(vomma) else 0.0,
+        "Evaluations": len(scenarios),
+    }
 
 
 # -------------------------------------------------------------------------
-# 4. Calcul complet des greeks selon une méthode
+# 3. Calcul complet des greeks selon une méthode
 # -------------------------------------------------------------------------
-def compute_method_greeks(market, option, N, exercise, optimize, threshold, method):
+def compute_method_greeks(market, option, N, exercise, optimize, threshold, method, mode="bump"):
     """
     Calcule les principaux grecs pour une méthode donnée.
+    En backward, tous les pricings partagent un même PricingContext.
+
+    mode="lattice" (backward uniquement) : le prix, Delta, Gamma et Theta
+    sont lus sur un seul arbre commencé GREEK_LEAD_STEPS pas avant t = 0
+    (voir run_lattice_greeks) au lieu d’être obtenus par rebump ; Vega,
+    Rho, Vanna et Vomma restent calculés par différences finies.
+    Incompatible avec le pruning (optimize = "Oui").
+
+    mode="batch" (backward uniquement) : tous les bumps sont pricés en un
+    seul appel compilé (voir batch_greeks).
+
+    mode="adjoint" (backward uniquement) : le prix, Delta, Vega, Rho et
+    Theta viennent d’une seule passe adjointe (voir run_adjoint_pricing) ;
+    Gamma, Vanna et Vomma restent calculés par différences finies.
+
+    Les marchés bumpés passent par un évaluateur mémoïsé
+    (MultiDimDerivative) : chaque point n’est pricé qu’une fois. Le nombre
+    de pricings effectués est renvoyé sous la clé "Evaluations".
     """
-    base_price = get_price(market, option, N, exercise, optimize, threshold, method)
+    mode = mode.lower()
+    if mode not in ("bump", "lattice", "batch", "adjoint"):
+        raise ValueError(f"compute_method_greeks : mode inconnu '{mode}'.")
+    if mode != "bump" and method.lower() != "backward":
+        raise ValueError(f"compute_method_greeks : le mode {mode} nécessite la méthode backward.")
+    if mode == "lattice" and optimize == "Oui":
+        raise ValueError("compute_method_greeks : le mode lattice est incompatible avec le pruning.")
+    if mode == "batch":
+        return batch_greeks(market, option, N, exercise, optimize, threshold)
+
+    context = PricingContext(N) if method.lower() == "backward" else None
+    base = market.snapshot()
+
+    def price_at(point):
+        m = base.bumped(**dict(point, sigma=max(1e-6, point["sigma"])))
+        return get_price(m, option, N, exercise, optimize, threshold, method, context)
 
     # Petits incréments pour dérivées numériques
     hS = max(1e-5, 0.005 * market.S0)
     hSigma = max(1e-5, 0.005)
     hR = 1e-4
     hT = 1.0 / 365.0  # un jour
-
-    # --- Dérivées simples
-    dS = OneDimDerivative(greek_wrapper, (market, option, N, exercise, optimize, threshold, "S0", method), shift=hS)
-    dSigma = OneDimDerivative(greek_wrapper, (market, option, N, exercise, optimize, threshold, "sigma", method), shift=hSigma)
-    dR = OneDimDerivative(greek_wrapper, (market, option, N, exercise, optimize, threshold, "r", method), shift=hR)
-    dT = OneDimDerivative(greek_wrapper, (market, option, N, exercise, optimize, threshold, "T", method), shift=hT)
-
-    # --- Calcul des grecs
-    Delta = dS.first(market.S0)
-    Gamma = dS.second(market.S0)
-    Vega  = dSigma.first(market.sigma)
-    Rho   = dR.first(market.r)
-    Theta = -dT.first(market.T)
+    hS2 = max(1e-5, 0.01 * market.S0)   # Pas en S des dérivées croisées
+
+    # Un seul évaluateur mémoïsé : chaque marché bumpé n’est pricé qu’une fois
+    deriv = MultiDimDerivative(
+        price_at,
+        base={"S0": market.S0, "sigma": market.sigma, "r": market.r, "T": market.T},
+        shifts={"S0": hS, "sigma": hSigma, "r": hR, "T": hT},
+    )
+    pricings = 0
+    if mode == "lattice":
+        lattice, _ = run_lattice_greeks(market, option, N, exercise, optimize, threshold,
+                                        context=PricingContext(N + GREEK_LEAD_STEPS))
+        # Pas de seed : le point central de Vomma doit être le prix de l’arbre
+        # à N pas, comme les autres points, et non celui de l’arbre décalé
+        pricings = 1
+        Delta, Gamma, Theta = lattice["Delta"], lattice["Gamma"], lattice["Theta"]
+    elif mode == "adjoint":
+        price, sens, _ = run_adjoint_pricing(market, option, N, exercise, optimize, threshold)
+        deriv.seed(price)
+        pricings = 1
+        Delta, Theta = sens["S0"], -sens["T"]
+        Gamma = deriv.second("S0")
+    else:
+        Delta = deriv.first("S0")
+        Gamma = deriv.second("S0")
+        Theta = -deriv.first("T")
+
+    if mode == "adjoint":
+        Vega, Rho = sens["sigma"], sens["r"]
+    else:
+        Vega  = deriv.first("sigma")
+        Rho   = deriv.first("r")
 
     # --- Dérivées croisées
-    Vanna, Vomma = finite_diff_2d(market, option, N, exercise, optimize, threshold, method, base_price)
+    Vanna = deriv.cross("S0", "sigma", shift_a=hS2)
+    Vomma = deriv.second("sigma")
+
+    # Sécurité numérique
+    if not np.isfinite(Vanna): Vanna = 0.0
+    if not np.isfinite(Vomma): Vomma = 0.0
 
     return {
         "Delta": Delta,
@@ -115,13 +176,14 @@ def compute_method_greeks(market, option, N, exercise, optimize, threshold, meth
         "Vega": Vega,
         "Theta": Theta,
         "Rho": Rho,
-        "Vanna": Vanna,
-        "Vomma": Vomma,
+        "Vanna": float(Vanna),
+        "Vomma": float(Vomma),
+        "Evaluations": pricings + deriv.evaluations,
     }
 
 
 # -------------------------------------------------------------------------
-# 5. Fonction principale (intégrée à Excel)
+# 4. Fonction principale (intégrée à Excel)
 # -------------------------------------------------------------------------
 def compute_greeks():
     """
@@ -166,7 +228,7 @@ def compute_greeks():
 
 
 # -------------------------------------------------------------------------
-# 6. Exécution directe
+# 5. Exécution directe
 # -------------------------------------------------------------------------
 if __name__ == "__main__":
     compute_greeks()
\ No newline at end of file
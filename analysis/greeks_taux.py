@@ -19,8 +19,9 @@ def rate_test():
     r_values = np.linspace(-0.1, 0.10, 20)
     data = []
 
+    base = market.snapshot()
     for r_test in r_values:
-        market.r = r_test  
+        market = base.bumped(r=r_test)
         tree_greeks = compute_method_greeks(market, option, N, exercise, optimize, threshold, "backward")
         bs_vals = bs_greeks(S0, K, r_test, sigma, T, is_call)
         data.append([
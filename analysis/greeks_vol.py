@@ -19,8 +19,9 @@ def volatility_test():
     vol_values = np.linspace(0.05, 0.50, 20)
     data = []
 
+    base = market.snapshot()
     for vol in vol_values:
-        market.sigma = vol
+        market = base.bumped(sigma=vol)
         tree_greeks = compute_method_greeks(market, option, N, exercise, optimize, threshold, "backward")
         bs_vals = bs_greeks(S0, K, r, vol, T, is_call)
         data.append([
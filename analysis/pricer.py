@@ -17,24 +17,18 @@ def display_trees(wb, tree, show_stock, show_reach, show_option, threshold=1e-7)
     dans Excel.
     """
 
-    if hasattr(tree, "to_levels_for_excel"):
-        levels = tree.to_levels_for_excel()
-    elif hasattr(tree, "tree"):
-        levels = tree.tree
-    else:
+    if not hasattr(tree, "to_levels_for_excel"):
         raise ValueError("display_trees(): structure d’arbre non reconnue.")
 
-    def vertical_tree(levels, attr, decimals=6):
+    def vertical_tree(attr, decimals=6):
+        levels = tree.to_levels_for_excel(attr)
         n = len(levels)
         matrix = [[""] * n for _ in range(2 * n + 1)]
         center_row = n
 
         for i, level in enumerate(levels):
             offset = len(level) // 2
-            for j, node in enumerate(level):
-                if node is None:
-                    continue
-                value = getattr(node, attr, None)
+            for j, value in enumerate(level):
                 if value is None:
                     continue
                 matrix[center_row - (j - offset)][i] = round(value, decimals)
@@ -57,24 +51,21 @@ def display_trees(wb, tree, show_stock, show_reach, show_option, threshold=1e-7)
             print(f"[display_trees] Warning: failed to write '{sheet_name}': {e}")
 
     if show_stock:
-        matrix = vertical_tree(levels, "stock_price", 4)
+        matrix = vertical_tree("stock_price", 4)
         write_tree(wb, "Arbre Stock Price", "Stock Price Tree", matrix)
 
     if show_option:
-        matrix = vertical_tree(levels, "option_value", 6)
+        matrix = vertical_tree("option_value", 6)
         write_tree(wb, "Arbre Option", "Option Value Tree", matrix)
 
     if show_reach:
-        matrix = vertical_tree(levels, "p_reach", 10)
+        matrix = vertical_tree("p_reach", 10)
         write_tree(wb, "Arbre Proba", "Reach Probability Tree", matrix)
 
         # Probabilités locales (p_up, p_mid, p_down)
-        first = levels[0][0] if levels and levels[0] else None
-        if first:
-            for name in ("p_up", "p_mid", "p_down"):
-                if hasattr(first, name):
-                    matrix = vertical_tree(levels, name, 6)
-                    write_tree(wb, f"Arbre {name}", f"Local Probabilities ({name})", matrix)
+        for name in ("p_up", "p_mid", "p_down"):
+            matrix = vertical_tree(name, 6)
+            write_tree(wb, f"Arbre {name}", f"Local Probabilities ({name})", matrix)
 
 @xw.sub
 def run_pricer():
@@ -0,0 +1,133 @@
+import sys
+import os
+import itertools
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models.market import Market
+from models.option_trade import Option
+from core_pricer import (
+    run_backward_batch,
+    run_backward_price_only,
+    run_backward_pricing,
+    run_lattice_greeks,
+    run_recursive_pricing
+)
+
+# Écart maximal toléré entre moteurs (mêmes arbres, mêmes arrondis près)
+TOLERANCE = 1e-9
+
+
+def engines_test():
+    """
+    Compare les moteurs backward (arbre complet, price-only), batch et
+    récursif sur des arbres américains élagués : les noeuds de bord de
+    bande, dont des enfants sont hors bande, y sont exercés hors de la
+    région d’exercice contiguë.
+
+    Retour
+    ------
+    list
+        Lignes [K, type, N, seuil, récursif, backward, price-only, batch].
+    """
+    market = Market(S0=100, r=0.05, sigma=0.25, T=1.0)
+    cases = [(130, False, 151, 1e-3), (70, True, 400, 1e-3), (70, True, 400, 1e-4)]
+    cases += [(K, is_call, 101, threshold) for K, is_call, threshold
+              in itertools.product((80, 100, 125), (True, False), (1e-3, 1e-6))]
+
+    rows = []
+    for K, is_call, N, threshold in cases:
+        option = Option(K=K, is_call=is_call)
+        reference, _, _ = run_recursive_pricing(market, option, N, "american", "Oui", threshold)
+        full, _, _ = run_backward_pricing(market, option, N, "american", "Oui", threshold)
+        price_only, _ = run_backward_price_only(market, option, N, "american", "Oui", threshold)
+        batch, _ = run_backward_batch(market, [option], N, ["american"], "Oui", threshold)
+        prices = (full, price_only, float(batch[0]))
+        if max(abs(p - reference) for p in prices) > TOLERANCE:
+            raise ValueError(f"engines_test : moteurs en désaccord pour K={K}, "
+                             f"{'call' if is_call else 'put'}, N={N}, seuil={threshold} : "
+                             f"récursif {reference}, backward {prices}.")
+        rows.append([K, "call" if is_call else "put", N, threshold, reference, *prices])
+    return rows
+
+
+def truncation_smoothing_test():
+    """
+    Compare les moteurs récursif et backward avec troncature par valeur et
+    lissage Black-Scholes du dernier pas : le prix récursif doit être celui
+    de l’arbre non tronqué, le prix backward tronqué rester dans sa borne
+    tree.truncation_error.
+
+    Retour
+    ------
+    list
+        Lignes [K, type, exercice, N, récursif, backward, backward tronqué].
+    """
+    market = Market(S0=100, r=0.05, sigma=0.25, T=1.0)
+    tol = 1e-6
+
+    rows = []
+    for K, is_call, exercise, N in itertools.product((80, 102, 120), (True, False),
+                                                     ("european", "american"), (7, 60)):
+        option = Option(K=K, is_call=is_call)
+        recursive, _, _ = run_recursive_pricing(market, option, N, exercise, "Non", 0.0,
+                                                truncation_tol=tol, smoothing=True)
+        reference, _, _ = run_backward_pricing(market, option, N, exercise, "Non", 0.0,
+                                               smoothing=True)
+        truncated, _, tree = run_backward_pricing(market, option, N, exercise, "Non", 0.0,
+                                                  truncation_tol=tol, smoothing=True)
+        if (abs(recursive - reference) > TOLERANCE
+                or abs(truncated - reference) > tree.truncation_error + TOLERANCE):
+            raise ValueError(f"truncation_smoothing_test : moteurs en désaccord pour K={K}, "
+                             f"{'call' if is_call else 'put'} {exercise}, N={N} : récursif "
+                             f"{recursive}, backward {reference}, tronqué {truncated}.")
+        rows.append([K, "call" if is_call else "put", exercise, N, recursive, reference, truncated])
+    return rows
+
+
+def lattice_test():
+    """
+    Vérifie que le prix lu à t = 0 sur l’arbre décalé des Greeks sur l’arbre
+    (run_lattice_greeks) est celui de l’arbre à N pas, et que ce mode est
+    refusé avec le pruning (bande différente de celle de l’arbre à N pas).
+
+    Retour
+    ------
+    list
+        Lignes [K, type, exercice, dividende, prix à N pas, prix lu sur l’arbre].
+    """
+    markets = {
+        False: Market(S0=100, r=0.05, sigma=0.25, T=1.0),
+        True: Market(S0=100, r=0.05, sigma=0.25, T=1.0, exdivdate=0.4312, rho=0.03),
+    }
+
+    rows = []
+    for K, is_call, exercise, has_div in itertools.product((90, 105), (True, False),
+                                                           ("european", "american"), (False, True)):
+        market, option = markets[has_div], Option(K=K, is_call=is_call)
+        reference, _ = run_backward_price_only(market, option, 201, exercise, "Non", 0.0)
+        lattice, _ = run_lattice_greeks(market, option, 201, exercise, "Non", 0.0)
+        if abs(lattice["Price"] - reference) > TOLERANCE:
+            raise ValueError(f"lattice_test : prix lu sur l’arbre {lattice['Price']} au lieu de "
+                             f"{reference} (K={K}, {'call' if is_call else 'put'} {exercise}).")
+        try:
+            run_lattice_greeks(market, option, 201, exercise, "Oui", 1e-4)
+        except ValueError:
+            pass
+        else:
+            raise ValueError("lattice_test : les Greeks lus sur l’arbre doivent refuser le pruning.")
+        rows.append([K, "call" if is_call else "put", exercise, has_div, reference, lattice["Price"]])
+    return rows
+
+
+def run_engines_test():
+    for row in engines_test():
+        print(*row)
+    for row in truncation_smoothing_test():
+        print(*row)
+    for row in lattice_test():
+        print(*row)
+
+
+if __name__ == "__main__":
+    run_engines_test()
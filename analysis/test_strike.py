@@ -8,9 +8,11 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from utils.utils_bs import bs_price
 from utils.utils_sheet import ensure_sheet
+from models.option_trade import Option
 from core_pricer import (
     input_parameters,
-    run_backward_pricing
+    run_backward_batch,
+    run_european_strip
 )
 
 def strike_test():
@@ -24,19 +26,15 @@ def strike_test():
 
     # Paramètres pour le test
     K_values = np.linspace(K-5, K+5, 30)
-    bs_prices, tree_prices = [], []
-
-    for k in K_values:
-        option.K = k
-
-        bs_p = bs_price(S0, k, r, sigma, T, is_call)
-        bs_prices.append(bs_p)
-
-        price_tree, _, _ = run_backward_pricing(market, option, N, exercise, optimize, threshold)
-        tree_prices.append(price_tree)
-
-    bs_prices = np.array(bs_prices)
-    tree_prices = np.array(tree_prices)
+    bs_prices = np.array([bs_price(S0, k, r, sigma, T, is_call) for k in K_values])
+
+    # Un seul arbre pour tous les strikes : prix d’Arrow-Debreu en européen,
+    # une seule récurrence arrière en américain
+    if exercise == "european":
+        tree_prices, _ = run_european_strip(market, K_values, is_call, N, optimize, threshold)
+    else:
+        options = [Option(K=k, is_call=is_call) for k in K_values]
+        tree_prices, _ = run_backward_batch(market, options, N, exercise, optimize, threshold)
     diff = tree_prices - bs_prices
 
     headers = ["Strike", "BS", "Tree", "Tree - BS"]
@@ -10,7 +10,7 @@ from utils.utils_bs import bs_price
 from utils.utils_sheet import ensure_sheet
 from core_pricer import (
     input_parameters,
-    run_backward_pricing,
+    run_backward_price_only,
 )
 
 def rate_test():
@@ -25,13 +25,14 @@ def rate_test():
     r_values = np.linspace(-0.1, 0.1, 30)
     bs_prices, tree_prices = [], []
 
+    base = market.snapshot()
     for r_test in r_values:
-        market.r = r_test
+        market = base.bumped(r=r_test)
 
         bs_p = bs_price(S0, K, r_test, sigma, T, is_call)
         bs_prices.append(bs_p)
 
-        tree_p, _, _ = run_backward_pricing(market, option, N, exercise, optimize=False, threshold=threshold)
+        tree_p, _ = run_backward_price_only(market, option, N, exercise, optimize=False, threshold=threshold)
         tree_prices.append(tree_p)
 
     bs_prices = np.array(bs_prices)
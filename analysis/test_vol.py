@@ -10,7 +10,7 @@ from utils.utils_bs import bs_price
 from utils.utils_sheet import ensure_sheet
 from core_pricer import (
     input_parameters,
-    run_backward_pricing
+    run_backward_price_only
 )
 
 def test_vol():
@@ -24,13 +24,14 @@ def test_vol():
     vol_values = np.linspace(0.05, 0.5, 30)
     bs_prices, tree_prices = [], []
 
+    base = market.snapshot()
     for vol in vol_values:
-        market.sigma = vol
+        market = base.bumped(sigma=vol)
 
         bs_p = bs_price(S0, K, r, vol, T, is_call)
         bs_prices.append(bs_p)
         
-        tree_p, _, _ = run_backward_pricing(market, option, N, exercise, optimize=False, threshold=threshold)
+        tree_p, _ = run_backward_price_only(market, option, N, exercise, optimize=False, threshold=threshold)
         tree_prices.append(tree_p)
 
     bs_prices = np.array(bs_prices)
@@ -8,8 +8,13 @@ from models.option_trade import Option
 from models.tree import TrinomialTree
 from utils.utils_bs import bs_price
 from utils.utils_date import datetime_to_years
-from models.backward_pricing import price_backward
-from models.recursive_pricing import price_recursive, clear_recursive_cache  # 👈 added import
+from models.backward_pricing import price_backward, price_backward_batch, price_backward_rolling
+from models.recursive_pricing import price_recursive
+from models.state_prices import StatePriceEngine
+from models.lattice_greeks import lattice_greeks
+from models.scenarios import price_scenarios
+from models.adjoint import price_backward_adjoint
+from utils.utils_constants import GREEK_LEAD_STEPS, RICHARDSON_SAFETY
 
 
 # -------------------------------------------------------------------------
@@ -76,46 +81,218 @@ def input_parameters():
 # -------------------------------------------------------------------------
 # 2. Backward pricing
 # -------------------------------------------------------------------------
-def run_backward_pricing(market, option, N, exercise, optimize, threshold):
-    """Calcule le prix de l’option via la méthode backward."""
+def run_backward_pricing(market, option, N, exercise, optimize, threshold, storage="full",
+                         truncation_tol=None, n_threads=None, smoothing=False):
+    """
+    Calcule le prix de l’option via la méthode backward.
+    truncation_tol active la troncature par valeur (borne d’erreur dans
+    tree.truncation_error) ; n_threads limite le nombre de threads utilisés
+    sur les niveaux larges (par défaut tous) ; smoothing active le lissage
+    Black-Scholes du dernier pas.
+    """
     start = time.time()
 
-    tree = TrinomialTree(market, option, N, exercise)
+    # Pruning : les noeuds sous le seuil ne sont pas construits
+    band_threshold = threshold if optimize == "Oui" else None
+    tree = TrinomialTree(market, option, N, exercise, storage, band_threshold, truncation_tol,
+                         smoothing=smoothing)
     tree.build_tree()
-    tree.compute_reach_probabilities()
 
+    price = price_backward(tree, n_threads)
+    elapsed = time.time() - start
+    return price, elapsed, tree
+
+
+def run_adjoint_pricing(market, option, N, exercise, optimize, threshold, n_threads=None,
+                        smoothing=False):
+    """
+    Calcule le prix backward et ses dérivées par rapport à S0, sigma, r et T
+    en une récurrence arrière suivie d’une passe adjointe (voir
+    price_backward_adjoint). Retourne (prix, dict des dérivées, temps écoulé).
+    """
+    start = time.time()
+    band_threshold = threshold if optimize == "Oui" else None
+    tree = TrinomialTree(market, option, N, exercise, "full", band_threshold, smoothing=smoothing)
+    tree.build_tree()
+    price, sensitivities = price_backward_adjoint(tree, n_threads)
+    elapsed = time.time() - start
+    return price, sensitivities, elapsed
+
+
+def _price_only(market, option, N, exercise, optimize, threshold, truncation_tol,
+                n_threads, smoothing, context, lead_steps=0):
+    """
+    Pricing backward sans conserver l’arbre ; retourne (arbre, prix).
+    Avec pruning ou troncature par valeur, la bande des noeuds conservés est
+    construite sur un arbre implicite, puis parcourue par le noyau backward
+    implicite ; sinon le noyau roulant reconstruit chaque niveau à la volée.
+    """
+    if optimize == "Oui" or truncation_tol is not None:
+        band_threshold = threshold if optimize == "Oui" else None
+        tree = TrinomialTree(market, option, N, exercise, "implicit", band_threshold, truncation_tol,
+                             smoothing=smoothing, context=context, lead_steps=lead_steps)
+        tree.build_tree()
+        return tree, price_backward(tree, n_threads)
+    tree = TrinomialTree(market, option, N, exercise, storage="implicit", smoothing=smoothing,
+                         context=context, lead_steps=lead_steps)
+    return tree, price_backward_rolling(tree, n_threads)
+
+
+def run_backward_price_only(market, option, N, exercise, optimize, threshold,
+                            truncation_tol=None, n_threads=None, smoothing=False, context=None):
+    """
+    Calcule uniquement le prix backward, sans conserver l’arbre (mémoire O(N)).
+    À utiliser quand seul le prix à la racine est utile (Greeks, balayages).
+    Avec pruning ou troncature par valeur, la bande des noeuds conservés est
+    construite sur un arbre implicite, puis parcourue par le noyau backward
+    implicite. Un PricingContext (context) dimensionné pour N évite toute
+    réallocation d’un appel à l’autre.
+    """
+    start = time.time()
+    _, price = _price_only(market, option, N, exercise, optimize, threshold, truncation_tol,
+                           n_threads, smoothing, context)
+    elapsed = time.time() - start
+    return price, elapsed
+
+
+def run_lattice_greeks(market, option, N, exercise, optimize, threshold,
+                       truncation_tol=None, n_threads=None, smoothing=False, context=None):
+    """
+    Prix, Delta, Gamma et Theta en un seul pricing backward : l’arbre
+    commence GREEK_LEAD_STEPS pas avant la date de pricing (même dt = T/N)
+    et les Greeks sont lus sur les niveaux autour de t = 0 (voir
+    lattice_greeks). context doit être dimensionné pour N + GREEK_LEAD_STEPS.
+    Incompatible avec le pruning (optimize = "Oui").
+    Retourne (dictionnaire des Greeks, temps écoulé).
+    """
     if optimize == "Oui":
-        tree.prune_tree(threshold)
+        raise ValueError("run_lattice_greeks : les Greeks lus sur l’arbre sont incompatibles "
+                         "avec le pruning.")
+    start = time.time()
+    tree, _ = _price_only(market, option, N, exercise, optimize, threshold, truncation_tol,
+                          n_threads, smoothing, context, lead_steps=GREEK_LEAD_STEPS)
+    greeks = lattice_greeks(tree)
+    elapsed = time.time() - start
+    return greeks, elapsed
+
 
-    price = price_backward(tree)
+def run_scenario_pricing(market, option, N, exercise, scenarios, optimize, threshold):
+    """
+    Calcule les prix backward d’une option sous une liste de scénarios de
+    marché (bumps de S0, r, sigma, T) en un seul appel compilé ; les
+    scénarios qui partagent un treillis sont pricés ensemble (voir
+    price_scenarios). Retourne (tableau des prix, temps écoulé).
+    """
+    start = time.time()
+    band_threshold = threshold if optimize == "Oui" else None
+    prices = price_scenarios(market, option, N, exercise, scenarios, band_threshold)
     elapsed = time.time() - start
-    return price, elapsed, tree
+    return prices, elapsed
+
+
+def run_backward_batch(market, options, N, exercises, optimize, threshold):
+    """
+    Calcule les prix backward d’un lot de contrats (strikes, call/put,
+    styles d’exercice) en une seule construction d’arbre et une seule
+    récurrence arrière. Retourne (tableau des prix, temps écoulé).
+    """
+    start = time.time()
+    band_threshold = threshold if optimize == "Oui" else None
+    tree = TrinomialTree(market, options[0], N, storage="implicit", band_threshold=band_threshold)
+    tree.build_tree()
+    prices = price_backward_batch(tree, options, exercises)
+    elapsed = time.time() - start
+    return prices, elapsed
+
+
+def run_european_strip(market, strikes, is_call, N, optimize, threshold):
+    """
+    Calcule les prix d’une série d’options européennes (strikes) à partir
+    des prix d’Arrow-Debreu à maturité : une induction vers l’avant, puis
+    O(N) par strike, sans récurrence arrière. Retourne (prix, temps écoulé).
+    """
+    start = time.time()
+    band_threshold = threshold if optimize == "Oui" else None
+    tree = TrinomialTree(market, Option(K=float(np.ravel(strikes)[0]), is_call=is_call), N,
+                         storage="implicit", band_threshold=band_threshold)
+    tree.build_tree()
+    prices = StatePriceEngine(tree).price_european_strip(strikes, is_call)
+    elapsed = time.time() - start
+    return prices, elapsed
+
+
+def run_richardson_pricing(market, option, exercise, target_error, optimize="Non", threshold=0.0,
+                           N_start=25, N_max=20000):
+    """
+    Prix backward à précision cible, sans choix manuel de N.
+
+    Le prix est calculé sur une suite de pas N, 2N, 4N, ... avec lissage
+    Black-Scholes du dernier pas (erreur en 1/N). Chaque couple (N, 2N) est
+    extrapolé à la Richardson : P* = 2·P(2N) - P(N). L’écart entre deux
+    extrapolations successives sous-estime l’erreur (la position du strike
+    entre deux noeuds la fait encore osciller) : l’erreur est estimée par
+    RICHARDSON_SAFETY fois le plus grand des deux derniers écarts, soit au
+    moins trois extrapolations. Le calcul s’arrête dès qu’elle est sous
+    target_error, ou quand le pas suivant dépasserait N_max.
+
+    En américain, la convergence n’est pas assez régulière pour cette
+    extrapolation : l’estimation reste indicative et la cible n’est jamais
+    déclarée atteinte.
+
+    Retour
+    ------
+    (float, int, float, bool)
+        Prix extrapolé, N le plus fin utilisé, estimation de l’erreur et
+        indicateur « cible atteinte » (faux si N_max est atteint avant, et
+        toujours en américain).
+    """
+    if target_error <= 0:
+        raise ValueError("target_error doit être strictement positif.")
+    if not 1 <= N_start <= N_max // 2:
+        raise ValueError("N_start doit être compris entre 1 et N_max / 2.")
+
+    N = N_start
+    price_prev, _ = run_backward_price_only(market, option, N, exercise, optimize, threshold,
+                                            smoothing=True)
+    extrapolated_prev = None
+    gap_prev = None
+    error, enough = np.inf, False
+    while True:
+        N *= 2
+        price, _ = run_backward_price_only(market, option, N, exercise, optimize, threshold,
+                                           smoothing=True)
+        extrapolated = 2.0 * price - price_prev
+        if extrapolated_prev is not None:
+            gap = abs(extrapolated - extrapolated_prev)
+            enough = gap_prev is not None   # Deux écarts successifs disponibles
+            error = RICHARDSON_SAFETY * max(gap, gap_prev or 0.0)
+            gap_prev = gap
+        converged = enough and error <= target_error
+        if converged or 2 * N > N_max:
+            return extrapolated, N, error, converged and exercise.lower() == "european"
+        price_prev, extrapolated_prev = price, extrapolated
 
 
 # -------------------------------------------------------------------------
-# 3. Recursive pricing (with cache clearing)
+# 3. Recursive pricing
 # -------------------------------------------------------------------------
-def run_recursive_pricing(market, option, N, exercise, optimize, threshold):
+def run_recursive_pricing(market, option, N, exercise, optimize, threshold, storage="full",
+                          truncation_tol=None, smoothing=False):
     """
     Calcule le prix de l’option via la méthode récursive.
-    Nettoie le cache après le pricing pour éviter les interférences
-    avec les appels successifs (utilisés pour les Greeks).
+    Le mémo est propre à l’appel : aucune interférence avec les appels
+    successifs (utilisés pour les Greeks).
     """
     start = time.time()
 
-    tree = TrinomialTree(market, option, N, exercise)
+    # Pruning : les noeuds sous le seuil ne sont pas construits
+    band_threshold = threshold if optimize == "Oui" else None
+    tree = TrinomialTree(market, option, N, exercise, storage, band_threshold, truncation_tol,
+                         smoothing=smoothing)
     tree.build_tree()
-    tree.compute_reach_probabilities()
-
-    if optimize == "Oui":
-        tree.prune_tree(threshold)
 
     price = price_recursive(tree)
     elapsed = time.time() - start
-
-    # ✅ Clear recursive cache for this tree
-    clear_recursive_cache(tree)
-
     return price, elapsed, tree
 
 
@@ -9,7 +9,7 @@ import plotly.express as px
 from models.market import Market
 from models.option_trade import Option
 from analysis.greeks import compute_method_greeks
-from core_pricer import run_backward_pricing, run_recursive_pricing, run_black_scholes
+from core_pricer import run_backward_batch, run_european_strip, run_recursive_pricing, run_richardson_pricing, run_black_scholes
 from utils.utils_date import datetime_to_years
 
 
@@ -75,6 +75,16 @@ st.sidebar.markdown("---")
 
 st.sidebar.subheader("🌲 Arbre")
 N = st.sidebar.number_input("Nombre de pas", value=100, step = 10)
+auto_N = st.sidebar.checkbox("N automatique (précision cible) ?", value=False)
+target_error = None
+if auto_N:
+    target_error = st.sidebar.number_input("Erreur cible", value=1e-4, min_value=1e-8, format="%.1e")
+greeks_label = st.sidebar.radio(
+    "Greeks (backward)",
+    ["Bumps", "Δ, Γ, Θ lus sur l’arbre", "Scénarios groupés", "Adjoint"],
+)
+greeks_mode = {"Bumps": "bump", "Δ, Γ, Θ lus sur l’arbre": "lattice", "Scénarios groupés": "batch",
+               "Adjoint": "adjoint"}[greeks_label]
 optimize = st.sidebar.radio("Pruning ?", ["Oui", "Non"], horizontal=True)
 
 if optimize == "Oui":
@@ -83,6 +93,10 @@ if optimize == "Oui":
         value="1e-7"
     )
 
+    if greeks_mode == "lattice":
+        st.sidebar.warning("Δ, Γ, Θ lus sur l’arbre : incompatible avec le pruning, Greeks par bumps.")
+        greeks_mode = "bump"
+
     try:
         threshold = float(threshold)
         if not (1e-20 <= threshold <= 1e-2):
@@ -132,14 +146,22 @@ option = Option(K=K, is_call=is_call)
 with tab_result:
     if button:
 
-        if method == "Trinomial – Backward":
-            option_eu, time_eu, _ = run_backward_pricing(market, option, N, exercise = "european", optimize=optimize, threshold=threshold)
-            option_us, time_us, _ = run_backward_pricing(market, option, N, exercise = "american", optimize=optimize, threshold=threshold)
-            greeks_eu = compute_method_greeks(market, option, N, exercise = "european", optimize=optimize, threshold=threshold, method="backward" )
-            greeks_us = compute_method_greeks(market, option, N, exercise = "american", optimize=optimize, threshold=threshold, method="backward" )
+        if method == "Trinomial – Backward" and auto_N:
+            option_eu, N_eu, error_eu, met_eu = run_richardson_pricing(market, option, "european", target_error, optimize=optimize, threshold=threshold)
+            option_us, N_us, error_us, _ = run_richardson_pricing(market, option, "american", target_error, optimize=optimize, threshold=threshold)
+            status_eu = "" if met_eu else ", cible non atteinte"
+            st.caption(f"N retenu : EU {N_eu} (erreur estimée {error_eu:.1e}{status_eu}), US {N_us} (estimation indicative {error_us:.1e}, cible non garantie en américain)")
+            greeks_eu = compute_method_greeks(market, option, N_eu, exercise = "european", optimize=optimize, threshold=threshold, method="backward", mode=greeks_mode )
+            greeks_us = compute_method_greeks(market, option, N_us, exercise = "american", optimize=optimize, threshold=threshold, method="backward", mode=greeks_mode )
+        elif method == "Trinomial – Backward":
+            (option_eu, option_us), time_batch = run_backward_batch(market, [option, option], N, ["european", "american"], optimize=optimize, threshold=threshold)
+            st.caption(f"Temps de calcul EU + US (une seule passe) : {time_batch:.3f} s")
+            greeks_eu = compute_method_greeks(market, option, N, exercise = "european", optimize=optimize, threshold=threshold, method="backward", mode=greeks_mode )
+            greeks_us = compute_method_greeks(market, option, N, exercise = "american", optimize=optimize, threshold=threshold, method="backward", mode=greeks_mode )
         else:
             option_eu, time_eu, _ = run_recursive_pricing(market, option, N, exercise = "european", optimize=optimize, threshold=threshold)
             option_us, time_us, _ = run_recursive_pricing(market, option, N, exercise = "american", optimize=optimize, threshold=threshold)
+            st.caption(f"Temps de calcul : EU {time_eu:.3f} s, US {time_us:.3f} s")
             greeks_eu = compute_method_greeks(market, option, N, exercise = "european", optimize=optimize, threshold=threshold, method="recursive" )
             greeks_us = compute_method_greeks(market, option, N, exercise = "american", optimize=optimize, threshold=threshold, method="recursive" )
 
@@ -256,26 +278,37 @@ with tab_prix:
 
         st.markdown(f"### 📈 Impact de {variable_prix}")
 
-        for val in variable_range:
-            if variable_prix == "Volatilité (σ)":
-                market.sigma = val
-            elif variable_prix == "Taux sans risque (r)":
-                market.r = val
-            elif variable_prix == "Maturité (T)":
-                market.T = val
-            elif variable_prix == "Prix d'exercice (K)":
-                option.K = val
-
-            if method == "Trinomial – Backward":
-                eu, _, _ = run_backward_pricing(market, option, N, exercise="european", optimize=optimize, threshold=threshold)
-                us, _, _ = run_backward_pricing(market, option, N, exercise="american", optimize=optimize, threshold=threshold)
-            else:
-                eu, _, _ = run_recursive_pricing(market, option, N, exercise="european", optimize=optimize, threshold=threshold)
-                us, _, _ = run_recursive_pricing(market, option, N, exercise="american", optimize=optimize, threshold=threshold)
-
-            EU_prices.append(eu)
-            US_prices.append(us)
-            Diff.append(us - eu)
+        if method == "Trinomial – Backward" and variable_prix == "Prix d'exercice (K)":
+            # Toute la chaîne de strikes : prix d’Arrow-Debreu pour l’européen,
+            # une seule récurrence arrière pour l’américain
+            chain = [Option(K=val, is_call=is_call) for val in variable_range]
+            eu_prices, _ = run_european_strip(market, variable_range, is_call, N, optimize=optimize, threshold=threshold)
+            us_prices, _ = run_backward_batch(market, chain, N, "american", optimize=optimize, threshold=threshold)
+            EU_prices = list(eu_prices)
+            US_prices = list(us_prices)
+            Diff = [us - eu for eu, us in zip(EU_prices, US_prices)]
+        else:
+            base_market = market.snapshot()
+            for val in variable_range:
+                market = base_market
+                if variable_prix == "Volatilité (σ)":
+                    market = base_market.bumped(sigma=val)
+                elif variable_prix == "Taux sans risque (r)":
+                    market = base_market.bumped(r=val)
+                elif variable_prix == "Maturité (T)":
+                    market = base_market.bumped(T=val)
+                elif variable_prix == "Prix d'exercice (K)":
+                    option.K = val
+
+                if method == "Trinomial – Backward":
+                    (eu, us), _ = run_backward_batch(market, [option, option], N, ["european", "american"], optimize=optimize, threshold=threshold)
+                else:
+                    eu, _, _ = run_recursive_pricing(market, option, N, exercise="european", optimize=optimize, threshold=threshold)
+                    us, _, _ = run_recursive_pricing(market, option, N, exercise="american", optimize=optimize, threshold=threshold)
+
+                EU_prices.append(eu)
+                US_prices.append(us)
+                Diff.append(us - eu)
 
         df_sensitivity = pd.DataFrame({
         "Variable": variable_range,
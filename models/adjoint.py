@@ -0,0 +1,329 @@
+import math
+import numpy as np
+from numba import njit
+from models.backward_pricing import _smoothed_value, price_backward
+from models.payoffs import vanilla_payoff
+from utils.utils_constants import MIN_P
+from utils.utils_dividends import get_dividend_schedule
+
+# Paramètres différenciés, dans l’ordre des colonnes des tangentes
+ADJOINT_PARAMS = ("S0", "sigma", "r", "T")
+
+
+@njit(fastmath=True, cache=True)
+def _trunk_tangents(trunk, exp_r_dt, d_rdt, has_div, div_prop, d_fixed, dtrunk):
+    """
+    Tangentes du tronc : dtrunk[i, p] = ∂trunk[i] / ∂θ_p, par dérivation de
+    trunk[i] = trunk[i-1] · exp(r·dt) - div (div = fixed + prop · trunk[i-1]
+    sur un pas avec dividende). dtrunk[0] doit être renseigné.
+    """
+    for i in range(1, len(trunk)):
+        for p in range(4):
+            d = (dtrunk[i - 1, p] + trunk[i - 1] * d_rdt[p]) * exp_r_dt
+            if has_div[i - 1]:
+                d -= d_fixed[p] + div_prop[i - 1] * dtrunk[i - 1, p]
+            dtrunk[i, p] = d if trunk[i] > MIN_P else 0.0
+
+
+@njit(fastmath=True, cache=True)
+def _step_tangents(alpha, exp_sig2_dt, dloga, d_sig2dt, pD, dP):
+    """
+    Tangentes du triplet constant d’un pas sans dividende :
+    p_down = (exp(σ²dt) - 1) / ((1 - a)(1/a² - 1)), p_up = p_down / a,
+    p_mid = 1 - p_up - p_down. dP (3, 4) est rempli en place.
+    """
+    a = alpha
+    den = (1.0 - a) * (1.0 / (a * a) - 1.0)
+    for p in range(4):
+        da = a * dloga[p]
+        dden = -da * (1.0 / (a * a) - 1.0) - (1.0 - a) * 2.0 * da / (a * a * a)
+        d_down = exp_sig2_dt * d_sig2dt[p] / den - pD * dden / den
+        d_up = d_down / a - pD * da / (a * a)
+        dP[0, p] = d_down
+        dP[1, p] = -d_up - d_down
+        dP[2, p] = d_up
+
+
+@njit(fastmath=True, cache=True)
+def _node_tangents(S, dS, exp_r_dt, exp_sig2_dt, alpha, dloga, d_rdt, d_sig2dt,
+                   div, d_div, S_mid, dS_mid, dP):
+    """
+    Tangentes des probabilités d’un noeud d’un pas avec dividende (k′
+    fixé), par dérivation de node_probabilities : ajustement des deux
+    premiers moments puis clip_and_normalize (les probabilités écrêtées à 0
+    ont une tangente nulle). dP (3, 4) est rempli en place.
+    """
+    a = alpha
+    a2 = a * a
+    er2 = exp_r_dt * exp_r_dt
+    E = S * exp_r_dt - div
+    V = S * S * er2 * (exp_sig2_dt - 1.0)
+    m1 = E / S_mid
+    m2 = (V + E * E) / (S_mid * S_mid)
+    den = (1.0 - a) * (1.0 / a2 - 1.0)
+    num = (m2 - 1.0) - (a + 1.0) * (m1 - 1.0)
+    p_down = num / den
+    p_up = (m1 - 1.0 - (1.0 / a - 1.0) * p_down) / (a - 1.0)
+    p_mid = 1.0 - p_up - p_down
+    raw = (p_down, p_mid, p_up)
+    total = max(p_down, 0.0) + max(p_mid, 0.0) + max(p_up, 0.0)
+
+    for p in range(4):
+        da = a * dloga[p]
+        dE = (dS[p] + S * d_rdt[p]) * exp_r_dt - d_div[p]
+        dV = (2.0 * S * dS[p] * (exp_sig2_dt - 1.0)
+              + S * S * (2.0 * d_rdt[p] * (exp_sig2_dt - 1.0) + exp_sig2_dt * d_sig2dt[p])) * er2
+        dm1 = dE / S_mid - m1 * dS_mid[p] / S_mid
+        dm2 = (dV + 2.0 * E * dE) / (S_mid * S_mid) - 2.0 * m2 * dS_mid[p] / S_mid
+        dden = -da * (1.0 / a2 - 1.0) - (1.0 - a) * 2.0 * da / (a2 * a)
+        dnum = dm2 - da * (m1 - 1.0) - (a + 1.0) * dm1
+        d_down = dnum / den - p_down * dden / den
+        d_up = (dm1 + da / a2 * p_down - (1.0 / a - 1.0) * d_down) / (a - 1.0) \
+            - p_up * da / (a - 1.0)
+        d_raw = (d_down, -d_up - d_down, d_up)
+
+        # clip_and_normalize : p_c = max(raw_c, 0) / total
+        d_total = 0.0
+        for c in range(3):
+            if raw[c] > 0.0:
+                d_total += d_raw[c]
+        for c in range(3):
+            d_clip = d_raw[c] if raw[c] > 0.0 else 0.0
+            dP[c, p] = d_clip / total - max(raw[c], 0.0) * d_total / (total * total)
+
+
+@njit(fastmath=True, cache=True)
+def _smoothed_partials(S, K, is_call, is_american, r, sigma, dt, div, out):
+    """
+    Dérivées partielles de _smoothed_value par rapport à (S, sigma, r, dt,
+    div), par différences centrées : le lissage ne porte que sur un niveau,
+    O(N) noeuds.
+    """
+    x = (S, sigma, r, dt, div)
+    for q in range(5):
+        h = 1e-6 * max(abs(x[q]), 1e-3)
+        up = [S, sigma, r, dt, div]
+        down = [S, sigma, r, dt, div]
+        up[q] += h
+        down[q] -= h
+        v_up = _smoothed_value(up[0], K, is_call, is_american, up[2], up[1], up[3], up[4])
+        v_down = _smoothed_value(down[0], K, is_call, is_american, down[2], down[1], down[3],
+                                 down[4])
+        out[q] = (v_up - v_down) / (2.0 * h)
+
+
+@njit(fastmath=True, cache=True)
+def _adjoint_kernel(option_value, stock_price, level_offset, k_lo, k_hi, trunk, dtrunk,
+                    alpha, log_alpha,
+                    dloga, exp_r_dt, exp_sig2_dt, d_rdt, d_sig2dt, df, step_proba,
+                    proba_offset, node_proba, node_kprime, has_div, div_fixed, div_prop,
+                    d_fixed, K, is_call, is_american, smoothing, r, sigma, dt, d_dt, grad):
+    """
+    Passe adjointe de la récurrence arrière, en une induction vers l’avant.
+
+    lam[j] = ∂V(0,0) / ∂V(i, k) est propagé de la racine vers la maturité :
+    un noeud de continuation envoie lam · df · p à ses enfants (hors bande :
+    rien), un noeud exercé (max() actif du côté du payoff) ou terminal
+    arrête la propagation. Chaque noeud ajoute à grad sa contribution
+    locale : dérivée de df et des probabilités pour un noeud de
+    continuation, dérivée du payoff (via S = trunk[i] · alpha^k) pour un
+    noeud exercé ou terminal. Les dérivées par pas (tronc, alpha, df,
+    triplets) sont des tangentes en O(N) ; seul lam est propagé sur les
+    O(N²) noeuds.
+
+    Paramètres
+    ----------
+    option_value, stock_price : np.ndarray
+        Valeurs (price_backward) et prix du sous-jacent de tous les noeuds
+        d’un arbre en mode "full".
+    dtrunk : np.ndarray
+        Tangentes du tronc (N+1, 4).
+    dloga, d_rdt, d_sig2dt, d_fixed, d_dt : np.ndarray
+        Tangentes (4) de log(alpha), r·dt, σ²·dt, de la partie fixe du
+        dividende et de dt.
+    smoothing : bool
+        Si vrai, le niveau N-1 est terminal : sa valeur lissée
+        (_smoothed_value) est dérivée par _smoothed_partials.
+    grad : np.ndarray
+        Gradient (4) de la valeur à la racine, rempli en place.
+    """
+    N = len(trunk) - 1
+    W = 2 * N + 1
+    lam = np.zeros(W)
+    lam_next = np.zeros(W)
+    dP = np.empty((3, 4))
+    dS = np.empty(4)
+    dS_mid = np.empty(4)
+    d_div = np.empty(4)
+    partials = np.empty(5)
+    last = N - 1 if smoothing and N > 0 else N   # Dernier niveau parcouru
+    lam[0] = 1.0
+    grad[:] = 0.0
+    next_off, next_width, offset = 0, 0, -1
+    pD, pM, pU, div, hold, c = 0.0, 0.0, 0.0, 0.0, 0.0, 0
+
+    for i in range(last + 1):
+        width = k_hi[i] - k_lo[i] + 1
+        base = level_offset[i]
+        terminal = i == last
+        if i < N:
+            div = div_fixed[i] + div_prop[i] * trunk[i]
+            for p in range(4):
+                d_div[p] = d_fixed[p] + div_prop[i] * dtrunk[i, p] if has_div[i] else 0.0
+        if not terminal:
+            next_off = level_offset[i + 1]
+            next_width = k_hi[i + 1] - k_lo[i + 1] + 1
+            lam_next[:next_width] = 0.0
+            offset = proba_offset[i]
+            if offset < 0:
+                pD, pM, pU = step_proba[i, 0], step_proba[i, 1], step_proba[i, 2]
+                _step_tangents(alpha, exp_sig2_dt, dloga, d_sig2dt, pD, dP)
+
+        hold_sum = 0.0                    # Σ lam · V (continuation) : dérivée de df
+        acc_D, acc_M, acc_U = 0.0, 0.0, 0.0   # Σ lam · V_enfant : dérivée du triplet
+        pay_0, pay_1 = 0.0, 0.0           # Σ lam · payoff′ · S (· k) : dérivée des prix
+
+        for j in range(width):
+            l = lam[j]
+            if l == 0.0:
+                continue
+            k = k_lo[i] + j
+            S = stock_price[base + j]
+
+            if terminal and i < N:
+                # Niveau lissé : V = _smoothed_value(S, sigma, r, dt, div)
+                _smoothed_partials(S, K, is_call, is_american, r, sigma, dt, div, partials)
+                for p in range(4):
+                    dS_p = S * (dtrunk[i, p] / trunk[i] + k * dloga[p])
+                    d_sig = 1.0 if p == 1 else 0.0
+                    d_r = 1.0 if p == 2 else 0.0
+                    grad[p] += l * (partials[0] * dS_p + partials[1] * d_sig + partials[2] * d_r
+                                    + partials[3] * d_dt[p] + partials[4] * d_div[p])
+                continue
+
+            if not terminal:
+                # Enfants et poids du noeud
+                if offset < 0:
+                    c = k - 1 - k_lo[i + 1]
+                else:
+                    pD = node_proba[offset + j, 0]
+                    pM = node_proba[offset + j, 1]
+                    pU = node_proba[offset + j, 2]
+                    c = node_kprime[offset + j] - 1 - k_lo[i + 1]
+                v_D = option_value[next_off + c] if 0 <= c < next_width else 0.0
+                v_M = option_value[next_off + c + 1] if 0 <= c + 1 < next_width else 0.0
+                v_U = option_value[next_off + c + 2] if 0 <= c + 2 < next_width else 0.0
+                hold = df * (pD * v_D + pM * v_M + pU * v_U)
+
+            if terminal or (is_american and vanilla_payoff(S, K, is_call) > hold):
+                # Noeud terminal ou exercé : V = payoff(S), de pente ±1 dans la monnaie
+                if (S > K) if is_call else (S < K):
+                    slope = 1.0 if is_call else -1.0
+                    pay_0 += l * slope * S
+                    pay_1 += l * slope * S * k
+                continue
+
+            # Noeud de continuation : V = df · (pD V_D + pM V_M + pU V_U)
+            hold_sum += l * hold
+            if 0 <= c < next_width:
+                lam_next[c] += l * df * pD
+            if 0 <= c + 1 < next_width:
+                lam_next[c + 1] += l * df * pM
+            if 0 <= c + 2 < next_width:
+                lam_next[c + 2] += l * df * pU
+
+            if offset < 0:
+                acc_D += l * v_D
+                acc_M += l * v_M
+                acc_U += l * v_U
+            else:
+                kp = node_kprime[offset + j]
+                S_mid = trunk[i + 1] * math.exp(log_alpha * kp)
+                for p in range(4):
+                    dS[p] = S * (dtrunk[i, p] / trunk[i] + k * dloga[p])
+                    dS_mid[p] = S_mid * (dtrunk[i + 1, p] / trunk[i + 1] + kp * dloga[p])
+                _node_tangents(S, dS, exp_r_dt, exp_sig2_dt, alpha, dloga, d_rdt, d_sig2dt,
+                               div, d_div, S_mid, dS_mid, dP)
+                for p in range(4):
+                    grad[p] += l * df * (dP[0, p] * v_D + dP[1, p] * v_M + dP[2, p] * v_U)
+
+        # Contributions du niveau
+        for p in range(4):
+            grad[p] += pay_0 * dtrunk[i, p] / trunk[i] + pay_1 * dloga[p]
+            if not terminal:
+                grad[p] -= hold_sum * d_rdt[p]          # d(df) = -df · d(r·dt)
+                if offset < 0:
+                    grad[p] += df * (dP[0, p] * acc_D + dP[1, p] * acc_M + dP[2, p] * acc_U)
+
+        if not terminal:
+            lam, lam_next = lam_next, lam
+
+
+def price_backward_adjoint(tree, n_threads=None):
+    """
+    Prix et sensibilités dV/dS0, dV/dsigma, dV/dr et dV/dT par
+    différentiation adjointe (mode inverse) de la récurrence arrière.
+
+    Une récurrence arrière complète (price_backward, mode "full") conserve
+    la valeur de chaque noeud ; une seule passe adjointe vers l’avant
+    (_adjoint_kernel) propage ensuite ∂V / ∂V(i, k) et accumule les quatre
+    dérivées : le coût total est de l’ordre de deux à trois pricings, au
+    lieu de huit pricings bumpés. En américain, max() est dérivé selon sa
+    branche active (exercice ou continuation) ; la date du pas de dividende
+    et les positions k′ sont discrètes et considérées fixes.
+
+    Avec dividende, la partie fixe rho · S0 · decay dépend de S0 : elle est
+    dérivée comme dans un bump de Market.S0.
+
+    Les dérivées sont celles du prix de l’arbre à N fixé : sans lissage,
+    elles suivent l’oscillation de ce prix avec la position du strike entre
+    deux noeuds. Avec tree.smoothing, le niveau N-1 lissé par Black-Scholes
+    est dérivé directement et les sensibilités sont régulières en S0.
+
+    Paramètres
+    ----------
+    tree : TrinomialTree
+        Arbre construit en mode "full", sans troncature par valeur
+        (l’élagage en bande et le lissage sont supportés).
+
+    Retour
+    ------
+    (float, dict)
+        Prix à la racine et dérivées {"S0", "sigma", "r", "T"}.
+    """
+    if tree.implicit:
+        raise ValueError("price_backward_adjoint : un arbre en mode \"full\" est nécessaire.")
+    if tree.truncation_tol is not None:
+        raise ValueError("price_backward_adjoint : la troncature par valeur n’est pas supportée.")
+
+    price = price_backward(tree, n_threads)
+
+    N, dt, r, sigma = tree.N, tree.dt, tree.r, tree.sigma
+    n_steps = N - tree.lead_steps   # dt = T / n_steps
+
+    # Tangentes scalaires (colonnes : S0, sigma, r, T)
+    d_rdt = np.array([0.0, 0.0, dt, r / n_steps])
+    d_sig2dt = np.array([0.0, 2.0 * sigma * dt, 0.0, sigma ** 2 / n_steps])
+    dloga = np.array([0.0, math.sqrt(3.0 * dt), 0.0, 0.5 * sigma * math.sqrt(3.0 / dt) / n_steps])
+    d_dt = np.array([0.0, 0.0, 0.0, 1.0 / n_steps])
+
+    has_div, div_fixed, div_prop = get_dividend_schedule(tree.market, N, dt, t_start=tree.t_start)
+    fixed = float(div_fixed[has_div][0]) if has_div.any() else 0.0
+    d_fixed = np.array([fixed / tree.market.S0, 0.0, 0.0, 0.0])
+
+    # Racine en S0 · exp(r · t_start), t_start = -lead_steps · dt
+    dtrunk = np.empty((N + 1, 4))
+    dtrunk[0] = tree.S_root * np.array([1.0 / tree.market.S0, 0.0, -tree.lead_steps * dt,
+                                        -r * tree.lead_steps / n_steps])
+    _trunk_tangents(tree.trunk, tree.exp_r_dt, d_rdt, has_div, div_prop, d_fixed, dtrunk)
+
+    grad = np.empty(4)
+    _adjoint_kernel(
+        tree.option_value, tree.stock_price, tree.level_offset, tree.k_lo, tree.k_hi,
+        tree.trunk, dtrunk,
+        tree.alpha, tree.log_alpha, dloga, tree.exp_r_dt, tree.exp_sig2_dt, d_rdt, d_sig2dt,
+        tree.df, tree.step_proba, tree.proba_offset, tree.node_proba, tree.node_kprime,
+        has_div, div_fixed, div_prop, d_fixed, float(tree.option.K), tree.option.is_call,
+        tree.exercise == "american", bool(tree.smoothing), r, sigma, dt, d_dt, grad,
+    )
+    return price, dict(zip(ADJOINT_PARAMS, (float(g) for g in grad)))
@@ -1,82 +1,979 @@
+import math
+from contextlib import contextmanager
+import numba
 import numpy as np
-from numba import njit
+from numba import njit, prange
+from models.payoffs import call_payoff, put_payoff, vanilla_payoff
+from models.pricing_context import PricingContext
+from models.probabilities import node_probabilities
+from models.tree_builder import build_trunk
+from utils.utils_bs import bs_price_nb
+from utils.utils_constants import BOUNDARY_MARGIN, PARALLEL_MIN_WIDTH
+from utils.utils_dividends import get_dividend_schedule
+
+
+@njit(fastmath=True, cache=True)
+def _child_value(V_next, c):
+    """
+    Valeur de l’enfant d’indice c au niveau i+1 ; un enfant hors de la
+    bande construite (élagué) vaut 0.
+    """
+    return V_next[c] if 0 <= c < len(V_next) else 0.0
+
+
+@njit(fastmath=True, cache=True)
+def _interior_range(width, next_width, shift):
+    """
+    Plage [a, b) des noeuds d’un niveau dont les trois enfants sont dans la
+    bande du niveau suivant. Seuls les noeuds de bord, en dehors de cette
+    plage, ont des enfants élagués et passent par _child_value.
+    """
+    a = min(width, max(0, -shift))
+    b = max(a, min(width, next_width - shift - 2))
+    return a, b
+
+
+@njit(fastmath=True, cache=True)
+def _hold(V_next, c, wD, wM, wU, interior):
+    """
+    Valeur de continuation pondérée (wD, wM, wU déjà actualisés) des enfants
+    c, c+1, c+2 ; sans contrôle de bornes pour un noeud intérieur.
+    """
+    if interior:
+        return wD * V_next[c] + wM * V_next[c + 1] + wU * V_next[c + 2]
+    return (wD * _child_value(V_next, c) + wM * _child_value(V_next, c + 1)
+            + wU * _child_value(V_next, c + 2))
+
 
 @njit(fastmath=True, cache=True)
-def _backward_kernel(V_next, pD, pM, pU, df, exer, is_american):
+def _hold_range(V_next, wD, wM, wU, shift, child, out, j_lo, j_hi):
+    """
+    Valeurs de continuation des noeuds [j_lo, j_hi) d’un niveau, écrites
+    dans out. Les poids wD, wM, wU (déjà actualisés) sont donnés par noeud.
+    Les noeuds intérieurs sont traités dans une boucle sans branche (donc
+    vectorisable) ; seuls les noeuds de bord contrôlent leurs enfants.
+
+    Si child est non vide (pas avec dividende), le premier enfant du noeud j
+    est child[j] au lieu de j + shift.
+    """
+    if len(child) > 0:
+        for j in range(j_lo, j_hi):
+            out[j] = _hold(V_next, child[j], wD[j], wM[j], wU[j], False)
+        return
+
+    a, b = _interior_range(len(out), len(V_next), shift)
+    a = min(max(a, j_lo), j_hi)
+    b = max(min(b, j_hi), a)
+    for j in range(j_lo, a):
+        out[j] = _hold(V_next, j + shift, wD[j], wM[j], wU[j], False)
+    for j in range(a, b):
+        c = j + shift
+        out[j] = wD[j] * V_next[c] + wM[j] * V_next[c + 1] + wU[j] * V_next[c + 2]
+    for j in range(b, j_hi):
+        out[j] = _hold(V_next, j + shift, wD[j], wM[j], wU[j], False)
+
+
+# --- Troncature par valeur ---
+# Type de région déterminée à chaque bord d’un niveau : valeur nulle (hors
+# de la monnaie), valeur égale au payoff (région d’exercice américaine) ou
+# aucune troncature de ce côté.
+_BOUND_NONE = -1
+_BOUND_ZERO = 0
+_BOUND_EXERCISE = 1
+
+
+def _truncation_sides(is_call, is_american, tol):
+    """
+    Renvoie le type de région (bord bas, bord haut) d’une option vanille :
+    le bord hors de la monnaie vaut 0, le bord dans la monnaie vaut le
+    payoff pour une option américaine.
     """
-    Numba pour la récurrence arrière dans un arbre trinomial.
+    if tol is None or tol <= 0.0:
+        return _BOUND_NONE, _BOUND_NONE
+    exercise = _BOUND_EXERCISE if is_american else _BOUND_NONE
+    return (_BOUND_ZERO, exercise) if is_call else (exercise, _BOUND_ZERO)
+
+
+@njit(fastmath=True, cache=True)
+def _exercise_stays_optimal(K, is_call, df, div):
+    """
+    Indique si, sur un pas, un noeud dont tous les enfants sont exercés
+    reste exercé : la continuation df · E[payoff] vaut alors
+    df·K - S + df·div (put) ou S - df·div - df·K (call), à comparer au payoff.
+    """
+    if is_call:
+        return K * (1.0 - df) <= df * div
+    return df * div <= K * (1.0 - df)
+
+
+@njit(fastmath=True, cache=True)
+def _truncation_window(width, shift, low_end, high_start, low_kind, high_kind):
+    """
+    Renvoie la plage [j_lo, j_hi) des noeuds à évaluer au niveau i : les
+    noeuds j < j_lo (resp. j >= j_hi) ont leurs trois enfants dans la région
+    déterminée basse [0, low_end) (resp. haute [high_start, ...)) du niveau
+    i+1 et prennent directement la valeur de la région.
+    """
+    j_lo = 0
+    j_hi = width
+    if low_kind != _BOUND_NONE:
+        j_lo = min(width, max(0, low_end - shift - 2))
+    if high_kind != _BOUND_NONE:
+        j_hi = max(j_lo, min(width, high_start - shift))
+    return j_lo, j_hi
+
+
+@njit(fastmath=True, cache=True)
+def _fill_truncated(V_new, exer, j_lo, j_hi, low_kind, high_kind):
+    """
+    Affecte la valeur de région (0 ou payoff) aux noeuds hors de [j_lo, j_hi).
+    """
+    for j in range(j_lo):
+        V_new[j] = exer[j] if low_kind == _BOUND_EXERCISE else 0.0
+    for j in range(j_hi, len(V_new)):
+        V_new[j] = exer[j] if high_kind == _BOUND_EXERCISE else 0.0
+
+
+@njit(fastmath=True, cache=True)
+def _near_boundary(v, e, kind, tol):
+    """
+    Indique si la valeur v est à moins de tol de la valeur de région.
+    """
+    if kind == _BOUND_ZERO:
+        return abs(v) <= tol
+    if kind == _BOUND_EXERCISE:
+        return e > 0.0 and v - e <= tol
+    return False
+
+
+@njit(fastmath=True, cache=True)
+def _truncation_extent(V, exer, j_lo, j_hi, tol, low_kind, high_kind):
+    """
+    Étend les régions déterminées du niveau aux noeuds évalués voisins
+    dont la valeur est à moins de tol de la valeur de région.
+
+    Retour
+    ------
+    (low_end, high_start) : la région basse est [0, low_end), la région
+    haute [high_start, largeur).
+    """
+    low_end = j_lo
+    while low_end < j_hi and _near_boundary(V[low_end], exer[low_end], low_kind, tol):
+        low_end += 1
+    high_start = j_hi
+    while high_start > low_end and _near_boundary(V[high_start - 1], exer[high_start - 1],
+                                                  high_kind, tol):
+        high_start -= 1
+    return low_end, high_start
+
+
+@njit(fastmath=True, cache=True)
+def _backward_kernel(V_next, wD, wM, wU, shift, child, exer, is_american, out, j_lo, j_hi):
+    """
+    Numba pour la récurrence arrière dans un arbre trinomial, sur les noeuds
+    [j_lo, j_hi) d’un niveau.
 
     Paramètres
     ----------
     V_next : np.ndarray
         Valeurs de l’option au niveau i+1 (niveau futur)
-    pD, pM, pU : np.ndarray
-        Probabilités locales (down, mid, up) au niveau i
-    df : float
-        Facteur d’actualisation exp(-r * dt)
+    wD, wM, wU : np.ndarray
+        Probabilités locales (down, mid, up) du niveau i, multipliées par le
+        facteur d’actualisation exp(-r * dt)
+    shift : int
+        Décalage entre bandes : les enfants du nœud j sont en
+        j + shift, j + shift + 1, j + shift + 2 dans V_next
+        (shift = k_lo[i] - 1 - k_lo[i+1], 0 pour un arbre complet) ;
+        un enfant hors de V_next (élagué) vaut 0
+    child : np.ndarray
+        Indice du premier enfant de chaque noeud sur un pas avec dividende
+        (enfants recentrés en k′), vide sur un pas uniforme
     exer : np.ndarray
         Valeur d’exercice immédiate (payoff)
     is_american : bool
         True si option américaine (exercice anticipé possible)
+    out : np.ndarray
+        Valeurs du niveau i (de la largeur du niveau), écrites en place
+    j_lo, j_hi : int
+        Plage [j_lo, j_hi) des noeuds évalués (troncature par valeur,
+        découpage entre threads)
+    """
+    _hold_range(V_next, wD, wM, wU, shift, child, out, j_lo, j_hi)
+    if is_american:
+        for j in range(j_lo, j_hi):
+            out[j] = max(out[j], exer[j])
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _backward_kernel_parallel(V_next, wD, wM, wU, shift, child, exer, is_american, out,
+                              j_lo, j_hi, n_chunks):
+    """
+    Variante multi-thread de _backward_kernel : la plage [j_lo, j_hi) est
+    découpée en n_chunks blocs contigus traités en parallèle. Chaque noeud
+    est écrit par un seul thread, le résultat est identique au noyau série.
+    """
+    size = (j_hi - j_lo + n_chunks - 1) // n_chunks
+    for t in prange(n_chunks):
+        a = j_lo + t * size
+        b = min(j_hi, a + size)
+        if a < b:
+            _backward_kernel(V_next, wD, wM, wU, shift, child, exer, is_american, out, a, b)
+
+
+@njit(fastmath=True, cache=True)
+def _sweep_level(V_next, wD, wM, wU, shift, child, exer, is_american, out, j_lo, j_hi, n_chunks):
+    """
+    Récurrence arrière d’un niveau : multi-thread si le niveau compte au
+    moins PARALLEL_MIN_WIDTH noeuds à évaluer, série sinon.
+    """
+    if n_chunks > 1 and j_hi - j_lo >= PARALLEL_MIN_WIDTH:
+        _backward_kernel_parallel(V_next, wD, wM, wU, shift, child, exer, is_american, out,
+                                  j_lo, j_hi, n_chunks)
+    else:
+        _backward_kernel(V_next, wD, wM, wU, shift, child, exer, is_american, out, j_lo, j_hi)
+
+
+@njit(fastmath=True, cache=True)
+def _level_payoff(mid, log_alpha, k0, K, is_call, out, j_lo, j_hi):
+    """
+    Payoffs des noeuds [j_lo, j_hi) d’un niveau de prix médian mid dont le
+    premier noeud est en k0 (prix mid · alpha^(k0 + j)).
+    """
+    for j in range(j_lo, j_hi):
+        out[j] = vanilla_payoff(mid * math.exp(log_alpha * (k0 + j)), K, is_call)
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _level_payoff_parallel(mid, log_alpha, k0, K, is_call, out, width, n_chunks):
+    """
+    Variante multi-thread de _level_payoff sur tout le niveau.
+    """
+    size = (width + n_chunks - 1) // n_chunks
+    for t in prange(n_chunks):
+        a = t * size
+        b = min(width, a + size)
+        if a < b:
+            _level_payoff(mid, log_alpha, k0, K, is_call, out, a, b)
+
+
+@njit(fastmath=True, cache=True)
+def _fill_level_payoff(mid, log_alpha, k0, K, is_call, out, width, n_chunks):
+    """
+    Payoffs d’un niveau, multi-thread pour les niveaux larges.
+    """
+    if n_chunks > 1 and width >= PARALLEL_MIN_WIDTH:
+        _level_payoff_parallel(mid, log_alpha, k0, K, is_call, out, width, n_chunks)
+    else:
+        _level_payoff(mid, log_alpha, k0, K, is_call, out, 0, width)
+
+
+# --- Frontière d’exercice américaine ---
+# Pour un put (resp. un call) vanille, la région d’exercice d’un niveau est
+# un intervalle de noeuds contigus en bas (resp. en haut) de la bande : elle
+# est décrite par l’indice de coupure s, exercice pour j < s (put) ou j >= s
+# (call). Avant un dividende, l’ajustement discret du tronc peut rompre
+# cette contiguïté aux extrémités de l’arbre : ces niveaux sont comparés
+# en entier et s repère le noeud exercé le plus proche de la monnaie. Sur
+# une bande élaguée, les noeuds de bord (enfants hors bande, valant 0)
+# peuvent aussi être exercés hors de cet intervalle : ils sont comparés.
+
+@njit(fastmath=True, cache=True)
+def _exercised(out, exer, j):
+    """
+    Indique si le noeud j est exercé : sa valeur est le payoff, non nul.
+    """
+    return exer[j] > 0.0 and out[j] == exer[j]
+
+
+@njit(fastmath=True, cache=True)
+def _exercise_split(out, exer, j_lo, j_hi, is_call):
+    """
+    Indice de coupure s de la région d’exercice, cherché dans [j_lo, j_hi) :
+    premier noeud exercé d’un call, dernier noeud exercé + 1 d’un put.
+    """
+    if is_call:
+        s = j_lo
+        while s < j_hi and not _exercised(out, exer, s):
+            s += 1
+    else:
+        s = j_hi
+        while s > j_lo and not _exercised(out, exer, s - 1):
+            s -= 1
+    return s
+
+
+@njit(fastmath=True, cache=True)
+def _compare_range(V_next, wD, wM, wU, shift, child, mid, log_alpha, k0, K, is_call,
+                   out, exer, a, b):
+    """
+    Valeurs américaines max(continuation, payoff) des noeuds [a, b).
+    """
+    _hold_range(V_next, wD, wM, wU, shift, child, out, a, b)
+    _level_payoff(mid, log_alpha, k0, K, is_call, exer, a, b)
+    for j in range(a, b):
+        out[j] = max(out[j], exer[j])
+
+
+@njit(fastmath=True, cache=True)
+def _american_level(V_next, wD, wM, wU, shift, child, mid, log_alpha, k0, K, is_call,
+                    out, exer, j_lo, j_hi, guess, full_payoff, exhaustive, n_chunks):
+    """
+    Récurrence arrière américaine d’un niveau guidée par la frontière
+    d’exercice : la comparaison continuation / payoff n’est faite que dans
+    une fenêtre autour de guess (coupure du niveau i+1 ramenée au niveau i).
+    La fenêtre est élargie tant que ses bords ne sont pas du bon côté de la
+    frontière ; au-delà, les noeuds sont directement exercés (payoff seul)
+    ou conservés (continuation seule, multi-thread pour les niveaux larges).
+    Côté continuation, les noeuds de bord de bande (hors _interior_range)
+    sont toujours comparés : leurs enfants élagués valent 0 et la région
+    d’exercice n’y est plus contiguë.
+
+    Les payoffs sont écrits dans exer sur toute la région d’exercice, bande
+    tronquée comprise ; si full_payoff est vrai, sur tout le niveau. Si
+    exhaustive est vrai (niveau précédant un dividende), tous les noeuds
+    sont comparés.
 
     Retour
     ------
-    V_new : np.ndarray
-        Valeurs de l’option au niveau i (niveau courant)
+    int
+        Indice de coupure s de la région d’exercice du niveau.
     """
+    width = len(out)
+    if exhaustive:
+        _fill_level_payoff(mid, log_alpha, k0, K, is_call, exer, width, n_chunks)
+        _sweep_level(V_next, wD, wM, wU, shift, child, exer, True, out, j_lo, j_hi, n_chunks)
+        return _exercise_split(out, exer, j_lo, j_hi, is_call)
+    if j_lo >= j_hi:
+        if full_payoff:
+            _level_payoff(mid, log_alpha, k0, K, is_call, exer, 0, width)
+        return j_lo
 
-    N = len(pD)
-    V_new = np.zeros(N)
+    lo = min(max(guess - BOUNDARY_MARGIN, j_lo), j_hi - 1)
+    hi = max(min(guess + BOUNDARY_MARGIN, j_hi), lo + 1)
+    _compare_range(V_next, wD, wM, wU, shift, child, mid, log_alpha, k0, K, is_call,
+                   out, exer, lo, hi)
 
-    for j in range(N):
-        Vd = V_next[j] if j < len(V_next) else 0.0
-        Vm = V_next[j + 1] if j + 1 < len(V_next) else 0.0
-        Vu = V_next[j + 2] if j + 2 < len(V_next) else 0.0
+    # Bords de la fenêtre : côté exercice en bas pour un put, en haut pour
+    # un call ; sinon élargissement (taille doublée) du côté fautif.
+    while True:
+        step = max(hi - lo, BOUNDARY_MARGIN)
+        grown = False
+        if lo > j_lo and _exercised(out, exer, lo) == is_call:
+            a = max(j_lo, lo - step)
+            _compare_range(V_next, wD, wM, wU, shift, child, mid, log_alpha, k0, K, is_call,
+                           out, exer, a, lo)
+            lo = a
+            grown = True
+        if hi < j_hi and _exercised(out, exer, hi - 1) != is_call:
+            b = min(j_hi, hi + step)
+            _compare_range(V_next, wD, wM, wU, shift, child, mid, log_alpha, k0, K, is_call,
+                           out, exer, hi, b)
+            hi = b
+            grown = True
+        if not grown:
+            break
 
-        hold = df * (pD[j] * Vd + pM[j] * Vm + pU[j] * Vu)
+    # Hors fenêtre : région d’exercice (payoff) et région de continuation
+    if is_call:
+        hold_lo, hold_hi = j_lo, lo
+        _level_payoff(mid, log_alpha, k0, K, is_call, exer, hi, width)
+        out[hi:j_hi] = exer[hi:j_hi]
+        if full_payoff:
+            _level_payoff(mid, log_alpha, k0, K, is_call, exer, 0, lo)
+    else:
+        hold_lo, hold_hi = hi, j_hi
+        _level_payoff(mid, log_alpha, k0, K, is_call, exer, 0, lo)
+        out[j_lo:lo] = exer[j_lo:lo]
+        if full_payoff:
+            _level_payoff(mid, log_alpha, k0, K, is_call, exer, hi, width)
 
-        V_new[j] = max(hold, exer[j]) if is_american else hold
+    # Région de continuation : les noeuds de bord, dont des enfants sont
+    # élagués (valeur 0), peuvent être exercés de ce côté de la frontière et
+    # restent comparés au payoff ; continuation seule pour les autres.
+    a, b = _interior_range(width, len(V_next), shift)
+    a = min(max(a, hold_lo), hold_hi)
+    b = max(min(b, hold_hi), a)
+    _compare_range(V_next, wD, wM, wU, shift, child, mid, log_alpha, k0, K, is_call,
+                   out, exer, hold_lo, a)
+    _sweep_level(V_next, wD, wM, wU, shift, child, exer, False, out, a, b, n_chunks)
+    _compare_range(V_next, wD, wM, wU, shift, child, mid, log_alpha, k0, K, is_call,
+                   out, exer, b, hold_hi)
 
-    return V_new
+    return _exercise_split(out, exer, lo, hi, is_call)
 
 
-def price_backward(tree):
+@njit(fastmath=True, cache=True)
+def _boundary_price(mid, log_alpha, k0, width, split, is_call):
     """
-    Calcule le prix d'une option via la méthode de récurrence arrière
+    Prix frontière S*(t_i) d’un niveau : plus haut noeud exercé d’un put,
+    plus bas noeud exercé d’un call ; NaN si aucun noeud n’est exercé.
+    """
+    j = split if is_call else split - 1
+    if j < 0 or j >= width:
+        return np.nan
+    return mid * math.exp(log_alpha * (k0 + j))
+
+
+@njit(fastmath=True, cache=True)
+def _capture_head(head, i, k0, values, width):
+    """
+    Copie les valeurs du niveau i (bande commençant en k0) dans head si i
+    fait partie des premiers niveaux : head[i, k + L] pour |k| <= L, avec
+    head de forme (L+1, 2L+1).
+    """
+    L = head.shape[0] - 1
+    if i > L:
+        return
+    for j in range(width):
+        k = k0 + j
+        if -L <= k <= L:
+            head[i, k + L] = values[j]
+
+
+@njit(fastmath=True, cache=True)
+def _smoothed_value(S, K, is_call, is_american, r, sigma, dt, div):
+    """
+    Lissage Black-Scholes du dernier pas : valeur d’un noeud du niveau N-1
+    égale au prix Black-Scholes sur dt, au lieu de l’espérance du payoff non
+    lisse de la maturité. Un dividende versé sur le pas est retiré du spot
+    par sa valeur actualisée. En américain, max avec la valeur d’exercice.
+    """
+    v = bs_price_nb(S - div * math.exp(-r * dt), K, r, sigma, dt, is_call)
+    return max(v, vanilla_payoff(S, K, is_call)) if is_american else v
+
+
+@njit(fastmath=True, cache=True)
+def _smoothed_level(mid, log_alpha, k0, K, is_call, is_american, r, sigma, dt, div, out):
+    """
+    Applique _smoothed_value à tous les noeuds du niveau N-1.
+    """
+    for j in range(len(out)):
+        out[j] = _smoothed_value(mid * math.exp(log_alpha * (k0 + j)), K, is_call,
+                                 is_american, r, sigma, dt, div)
+
+
+@njit(fastmath=True, cache=True)
+def _fill_step_weights(i, df, step_proba, proba_offset, node_proba, node_kprime, k_lo,
+                       width, wD, wM, wU, child):
+    """
+    Poids actualisés df · (pD, pM, pU) des noeuds du niveau i : triplet
+    constant pour un pas sans dividende, probabilités par noeud sinon.
+    Sur un pas avec dividende, l’indice du premier enfant de chaque noeud
+    (k′ - 1 dans la bande du niveau i+1) est écrit dans child.
+
+    Retour
+    ------
+    int
+        Nombre d’indices écrits dans child (0 sur un pas uniforme).
+    """
+    offset = proba_offset[i]
+    if offset < 0:
+        wD[:width] = df * step_proba[i, 0]
+        wM[:width] = df * step_proba[i, 1]
+        wU[:width] = df * step_proba[i, 2]
+        return 0
+    for j in range(width):
+        wD[j] = df * node_proba[offset + j, 0]
+        wM[j] = df * node_proba[offset + j, 1]
+        wU[j] = df * node_proba[offset + j, 2]
+        child[j] = node_kprime[offset + j] - 1 - k_lo[i + 1]
+    return width
+
+
+@njit(fastmath=True, cache=True)
+def _implicit_backward_kernel(trunk, log_alpha, step_proba, proba_offset, node_proba,
+                              node_kprime, k_lo, k_hi, df, K, is_call, is_american,
+                              div_step, tol, low_kind, high_kind, n_chunks,
+                              smoothing, r, sigma, dt, boundary, work, child_buf, head):
+    """
+    Récurrence arrière complète sur un arbre implicite : les prix des noeuds
+    (trunk[i] · alpha^k) et les payoffs sont recalculés à la volée sur la
+    bande [k_lo[i], k_hi[i]]. Deux colonnes de valeurs de taille 2N+1
+    (ping-pong) et les tampons du niveau (poids, payoffs) sont pris dans
+    work (6, 2N+1) et child_buf (2N+1) du PricingContext. Un enfant hors de la bande vaut 0 ; sur un pas avec
+    dividende, les enfants du noeud k sont en k′-1, k′, k′+1 (node_kprime).
+
+    Avec low_kind / high_kind différents de _BOUND_NONE, les régions
+    déterminées de chaque bord sont tronquées à la tolérance tol (voir
+    price_backward). Les niveaux larges sont répartis sur n_chunks threads.
+    Si smoothing est vrai, le niveau N-1 est lissé par Black-Scholes
+    (voir _smoothed_level). En américain, chaque niveau est évalué par
+    _american_level et son prix frontière est écrit dans boundary (N+1).
+    Les valeurs des premiers niveaux sont copiées dans head (_capture_head).
+
+    Retour
+    ------
+    (float, float)
+        Valeur de l’option à la racine et borne d’erreur de la troncature.
+    """
+    N = len(trunk) - 1
+    V, V_new, exer = work[0], work[1], work[2]
+    wD, wM, wU = work[3], work[4], work[5]
+    exer[:] = 0.0
+    error_bound = 0.0
+
+    # Payoff à maturité
+    width = k_hi[N] - k_lo[N] + 1
+    _fill_level_payoff(trunk[N], log_alpha, k_lo[N], K, is_call, V, width, n_chunks)
+    exer[:width] = V[:width]
+    _capture_head(head, N, k_lo[N], V, width)
+    low_end, high_start = _truncation_extent(V, exer, 0, width, tol, low_kind, high_kind)
+    split = _exercise_split(V, exer, 0, width, is_call)
+    full_payoff = low_kind == _BOUND_EXERCISE or high_kind == _BOUND_EXERCISE
+    last_div = -1
+    for i in range(N):
+        if div_step[i] != 0.0:
+            last_div = i
+    if is_american:
+        boundary[N] = _boundary_price(trunk[N], log_alpha, k_lo[N], width, split, is_call)
+
+    for i in range(N - 1, -1, -1):
+        shift = k_lo[i] - 1 - k_lo[i + 1]
+        V_next = V[:k_hi[i + 1] - k_lo[i + 1] + 1]
+        width = k_hi[i] - k_lo[i] + 1
+
+        n_child = _fill_step_weights(i, df, step_proba, proba_offset, node_proba, node_kprime,
+                                     k_lo, width, wD, wM, wU, child_buf)
+        child = child_buf[:n_child]
+
+        # Région d’exercice tronquée seulement si l’exercice y reste optimal ;
+        # aucune troncature sur un pas aux enfants recentrés
+        step_low, step_high = low_kind, high_kind
+        if not _exercise_stays_optimal(K, is_call, df, div_step[i]):
+            if step_low == _BOUND_EXERCISE:
+                step_low = _BOUND_NONE
+            if step_high == _BOUND_EXERCISE:
+                step_high = _BOUND_NONE
+        if n_child > 0:
+            step_low, step_high = _BOUND_NONE, _BOUND_NONE
+        j_lo, j_hi = _truncation_window(width, shift, low_end, high_start, step_low, step_high)
+
+        if smoothing and i == N - 1:
+            _smoothed_level(trunk[i], log_alpha, k_lo[i], K, is_call, is_american,
+                            r, sigma, dt, div_step[i], V_new[:width])
+            j_lo, j_hi = 0, width
+            if is_american:
+                _level_payoff(trunk[i], log_alpha, k_lo[i], K, is_call, exer, 0, width)
+                split = _exercise_split(V_new, exer, 0, width, is_call)
+        elif is_american:
+            split = _american_level(V_next, wD, wM, wU, shift, child, trunk[i], log_alpha,
+                                    k_lo[i], K, is_call, V_new[:width], exer, j_lo, j_hi,
+                                    split - shift - 1, full_payoff, i <= last_div, n_chunks)
+        else:
+            _sweep_level(V_next, wD, wM, wU, shift, child, exer, False, V_new[:width],
+                         j_lo, j_hi, n_chunks)
+        if is_american:
+            boundary[i] = _boundary_price(trunk[i], log_alpha, k_lo[i], width, split, is_call)
+
+        if j_lo > 0 or j_hi < width:
+            _fill_truncated(V_new[:width], exer, j_lo, j_hi, step_low, step_high)
+            error_bound += tol
+        low_end, high_start = _truncation_extent(V_new, exer, j_lo, j_hi, tol,
+                                                 low_kind, high_kind)
+        _capture_head(head, i, k_lo[i], V_new, width)
+
+        V, V_new = V_new, V
+
+    return V[0], error_bound
+
+
+@contextmanager
+def _thread_count(n_threads):
+    """
+    Fixe le nombre de threads numba le temps d’un pricing et renvoie le
+    nombre de blocs à utiliser par niveau. None : tous les threads
+    disponibles (numba.get_num_threads()).
+    """
+    previous = numba.get_num_threads()
+    if n_threads is not None:
+        if not 1 <= n_threads <= numba.config.NUMBA_NUM_THREADS:
+            raise ValueError(
+                f"n_threads doit être compris entre 1 et {numba.config.NUMBA_NUM_THREADS}."
+            )
+        numba.set_num_threads(n_threads)
+    try:
+        yield numba.get_num_threads()
+    finally:
+        numba.set_num_threads(previous)
+
+
+def price_backward(tree, n_threads=None):
+    """
+    Calcule le prix d'une option via la méthode de récurrence arrière.
+    Les valeurs intermédiaires sont conservées dans tree.option_value,
+    sauf en mode implicite où seul le prix à la racine est calculé.
+
+    Si tree.truncation_tol est fourni, les régions déterminées de chaque
+    niveau ne sont plus évaluées : aux bords, un noeud dont les trois
+    enfants ont une valeur à moins de tol de la valeur de région (0 hors de
+    la monnaie, payoff dans la région d’exercice américaine) prend
+    directement cette valeur. Chaque niveau tronqué ajoute au plus tol à
+    l’erreur à la racine ; la borne cumulée est stockée dans
+    tree.truncation_error.
+
+    Les niveaux d’au moins PARALLEL_MIN_WIDTH noeuds sont répartis sur
+    n_threads threads (par défaut tous les threads numba disponibles).
+
+    Si tree.smoothing est vrai, la continuation du dernier pas est remplacée
+    par le prix Black-Scholes sur dt (max avec l’exercice en américain) :
+    la convergence en N devient régulière, sans l’oscillation due au payoff
+    non lisse de la maturité.
+
+    En américain, la région d’exercice de chaque niveau est repérée à partir
+    de celle du niveau suivant (voir _american_level) : seuls les noeuds
+    proches de la frontière sont comparés au payoff. La frontière
+    d’exercice S*(t_i) est stockée dans tree.exercise_boundary (N+1, NaN aux
+    niveaux sans exercice).
+
+    Les valeurs des 2·GREEK_LEAD_STEPS+1 premiers niveaux (noeuds
+    |k| <= 2·GREEK_LEAD_STEPS, NaN hors bande) sont stockées dans
+    tree.head_values, pour la lecture des Greeks sur l’arbre.
+
+    Les tampons de travail sont pris dans tree.context (un PricingContext
+    créé pour l’appel si l’arbre n’en a pas) : tree.option_value,
+    tree.exercise_boundary et tree.head_values sont alors des vues réécrites
+    par le pricing suivant sur le même contexte.
     """
 
     option = tree.option
     df = tree.df
     is_american = (tree.exercise == "american")
     N = tree.N
-    tree_nodes = tree.tree
-
-    # Payoff à maturité)
-    last_level = tree_nodes[-1]
-    V = np.array(
-        [option.payoff(node.stock_price) if node is not None else 0.0
-         for node in last_level],
-        dtype=np.float64
-    )
+    tol = float(tree.truncation_tol or 0.0)
+    low_kind, high_kind = _truncation_sides(option.is_call, is_american, tol)
+    K = float(option.K)
+    ctx = tree.context if tree.context is not None else PricingContext(N)
+    boundary = ctx.boundary
+    boundary[:] = np.nan
+    tree.exercise_boundary = boundary if is_american else None
+    ctx.head[:] = np.nan
+    tree.head_values = ctx.head
 
-    # Boucle de récurrence arrière
-    for i in range(N - 1, -1, -1): 
-        level = tree_nodes[i]
-        n = len(level)
+    with _thread_count(n_threads) as n_chunks:
+        if tree.implicit:
+            price, tree.truncation_error = _implicit_backward_kernel(
+                tree.trunk, tree.log_alpha, tree.step_proba, tree.proba_offset,
+                tree.node_proba, tree.node_kprime, tree.k_lo, tree.k_hi,
+                df, K, option.is_call, is_american,
+                tree.div_step, tol, low_kind, high_kind, n_chunks,
+                tree.smoothing, tree.r, tree.sigma, tree.dt, boundary, ctx.work, ctx.child,
+                ctx.head,
+            )
+            return float(price)
 
-        pD = np.empty(n, dtype=np.float64)
-        pM = np.empty(n, dtype=np.float64)
-        pU = np.empty(n, dtype=np.float64)
-        exer = np.empty(n, dtype=np.float64)
+        tree.option_value = ctx.buffer("option_value", tree.n_nodes)
+        tree.option_value[:] = 0.0
+        exer, wD, wM, wU = ctx.work[2], ctx.work[3], ctx.work[4], ctx.work[5]
+        child_buf = ctx.child
+        error_bound = 0.0
 
-        for j, node in enumerate(level):
-            if node is None:
-                pD[j] = pM[j] = pU[j] = 0.0
-                exer[j] = 0.0
-            else:
-                pD[j], pM[j], pU[j] = node.p_down, node.p_mid, node.p_up
-                exer[j] = option.payoff(node.stock_price)
+        # Payoff à maturité
+        sl = tree.level_slice(N)
+        V = tree.option_value[sl]
+        V[:] = option.payoff(tree.stock_price[sl])
+        low_end, high_start = _truncation_extent(V, V, 0, len(V), tol, low_kind, high_kind)
+        split = _exercise_split(V, V, 0, len(V), option.is_call)
+        full_payoff = _BOUND_EXERCISE in (low_kind, high_kind)
+        div_steps = np.flatnonzero(tree.div_step)
+        last_div = div_steps[-1] if len(div_steps) else -1
+        exer[:] = 0.0
+        if is_american:
+            boundary[N] = _boundary_price(tree.trunk[N], tree.log_alpha, tree.k_lo[N], len(V),
+                                          split, option.is_call)
+
+        # Boucle de récurrence arrière : chaque niveau est écrit directement
+        # dans tree.option_value, le niveau i+1 servant de V_next
+        for i in range(N - 1, -1, -1):
+            sl = tree.level_slice(i)
+            width = sl.stop - sl.start
+            V_next, V = V, tree.option_value[sl]
 
-        V = _backward_kernel(V, pD, pM, pU, df, exer, is_american)
+            n_child = _fill_step_weights(i, df, tree.step_proba, tree.proba_offset,
+                                         tree.node_proba, tree.node_kprime, tree.k_lo,
+                                         width, wD, wM, wU, child_buf)
+            child = child_buf[:n_child]
+            shift = int(tree.k_lo[i] - 1 - tree.k_lo[i + 1])
+
+            # Région d’exercice tronquée seulement si l’exercice y reste optimal ;
+            # aucune troncature sur un pas aux enfants recentrés
+            step_low, step_high = low_kind, high_kind
+            if not _exercise_stays_optimal(K, option.is_call, df, tree.div_step[i]):
+                step_low = _BOUND_NONE if step_low == _BOUND_EXERCISE else step_low
+                step_high = _BOUND_NONE if step_high == _BOUND_EXERCISE else step_high
+            if n_child > 0:
+                step_low, step_high = _BOUND_NONE, _BOUND_NONE
+            j_lo, j_hi = _truncation_window(width, shift, low_end, high_start, step_low, step_high)
+
+            if tree.smoothing and i == N - 1:
+                _smoothed_level(tree.trunk[i], tree.log_alpha, tree.k_lo[i], K, option.is_call,
+                                is_american, tree.r, tree.sigma, tree.dt, tree.div_step[i], V)
+                j_lo, j_hi = 0, width
+                if is_american:
+                    _level_payoff(tree.trunk[i], tree.log_alpha, tree.k_lo[i], K, option.is_call,
+                                  exer, 0, width)
+                    split = _exercise_split(V, exer, 0, width, option.is_call)
+            elif is_american:
+                split = _american_level(V_next, wD, wM, wU, shift, child, tree.trunk[i],
+                                        tree.log_alpha, tree.k_lo[i], K, option.is_call, V, exer,
+                                        j_lo, j_hi, split - shift - 1, full_payoff, i <= last_div,
+                                        n_chunks)
+            else:
+                _sweep_level(V_next, wD, wM, wU, shift, child, exer, False, V, j_lo, j_hi, n_chunks)
+            if is_american:
+                boundary[i] = _boundary_price(tree.trunk[i], tree.log_alpha, tree.k_lo[i], width,
+                                              split, option.is_call)
+            if j_lo > 0 or j_hi < width:
+                _fill_truncated(V, exer, j_lo, j_hi, step_low, step_high)
+                error_bound += tol
+            low_end, high_start = _truncation_extent(V, exer, j_lo, j_hi, tol, low_kind, high_kind)
 
+    for i in range(min(N, ctx.head.shape[0] - 1) + 1):
+        sl = tree.level_slice(i)
+        _capture_head(ctx.head, i, tree.k_lo[i], tree.option_value[sl], sl.stop - sl.start)
+    tree.truncation_error = error_bound
     return float(V[0])
+
+
+@njit(fastmath=True, cache=True)
+def _batch_backward_kernel(trunk, log_alpha, step_proba, proba_offset, node_proba,
+                           node_kprime, k_lo, k_hi, df, K, is_call, is_american,
+                           values, work, child_buf):
+    """
+    Récurrence arrière simultanée de plusieurs contrats sur un même arbre.
+    Les valeurs sont rangées dans une matrice (contrats × noeuds) ; à chaque
+    niveau, prix des noeuds et probabilités sont calculés une fois puis
+    appliqués à toutes les lignes. Les deux matrices de largeur 2N+1 et les
+    tampons de niveau sont fournis par l’appelant (PricingContext), les prix
+    des noeuds étant recalculés à la volée (trunk · alpha^k).
+
+    Paramètres
+    ----------
+    K, is_call, is_american : np.ndarray
+        Strike, type et style d’exercice de chaque contrat (taille C).
+    values : np.ndarray
+        Tampon (2, C·(2N+1)) des deux matrices de valeurs.
+    work, child_buf : np.ndarray
+        Tampons de niveau (6, 2N+1) et (2N+1) d’un PricingContext.
+
+    Retour
+    ------
+    np.ndarray
+        Prix à la racine de chaque contrat (taille C).
+    """
+    N = len(trunk) - 1
+    C = len(K)
+    W = 2 * N + 1
+    # Matrice (contrats × noeuds) rangée ligne par ligne dans un tableau plat
+    V = values[0, :C * W]
+    V_new = values[1, :C * W]
+    S = work[0]
+    wD, wM, wU = work[3], work[4], work[5]
+
+    # Payoff à maturité
+    width = k_hi[N] - k_lo[N] + 1
+    for j in range(width):
+        S[j] = trunk[N] * math.exp(log_alpha * (k_lo[N] + j))
+    for c in range(C):
+        for j in range(width):
+            V[c * W + j] = vanilla_payoff(S[j], K[c], is_call[c])
+
+    for i in range(N - 1, -1, -1):
+        shift = k_lo[i] - 1 - k_lo[i + 1]
+        next_width = k_hi[i + 1] - k_lo[i + 1] + 1
+        width = k_hi[i] - k_lo[i] + 1
+
+        # Poids actualisés, enfants et prix du niveau, communs à tous les contrats
+        n_child = _fill_step_weights(i, df, step_proba, proba_offset, node_proba, node_kprime,
+                                     k_lo, width, wD, wM, wU, child_buf)
+        child = child_buf[:n_child]
+        for j in range(width):
+            S[j] = trunk[i] * math.exp(log_alpha * (k_lo[i] + j))
+
+        for c in range(C):
+            row = V_new[c * W:c * W + width]
+            _hold_range(V[c * W:c * W + next_width], wD, wM, wU, shift, child, row, 0, width)
+
+            if is_american[c]:
+                Kc = K[c]
+                if is_call[c]:
+                    for j in range(width):
+                        row[j] = max(row[j], call_payoff(S[j], Kc))
+                else:
+                    for j in range(width):
+                        row[j] = max(row[j], put_payoff(S[j], Kc))
+
+        V, V_new = V_new, V
+
+    return V[::W].copy()
+
+
+def price_backward_batch(tree, options, exercises):
+    """
+    Prix backward d’un lot de contrats sur l’arbre construit tree.
+
+    Le treillis (prix, probabilités, bandes) ne dépend ni du strike, ni du
+    type, ni du style d’exercice : il est construit une seule fois, puis une
+    récurrence arrière unique traite tous les contrats. Seuls les tableaux
+    par pas de tree sont utilisés, l’arbre peut donc être implicite. Les
+    matrices de valeurs et les tampons de niveau sont pris dans
+    tree.context (un PricingContext créé pour l’appel si l’arbre n’en a pas).
+
+    Paramètres
+    ----------
+    tree : TrinomialTree
+        Arbre construit (tree.option et tree.exercise sont ignorés), sans
+        troncature par valeur ni lissage, que la récurrence groupée ne
+        traite pas.
+    options : list[Option]
+        Contrats à évaluer.
+    exercises : str ou list[str]
+        Style d’exercice ("european" ou "american"), commun ou par contrat.
+
+    Retour
+    ------
+    np.ndarray
+        Prix de chaque contrat, dans l’ordre de options.
+    """
+    if tree.truncation_tol is not None or tree.smoothing:
+        raise ValueError("price_backward_batch: troncature par valeur et lissage ne sont pas "
+                         "supportés.")
+    if isinstance(exercises, str):
+        exercises = [exercises] * len(options)
+    if len(exercises) != len(options):
+        raise ValueError("price_backward_batch: un style d’exercice par contrat est attendu.")
+
+    K = np.array([float(o.K) for o in options], dtype=np.float64)
+    is_call = np.array([o.is_call for o in options], dtype=np.bool_)
+    is_american = np.array([e.lower() == "american" for e in exercises], dtype=np.bool_)
+
+    ctx = tree.context if tree.context is not None else PricingContext(tree.N)
+    values = ctx.buffer("batch_values", (2, len(options) * (2 * tree.N + 1)))
+    return _batch_backward_kernel(
+        tree.trunk, tree.log_alpha, tree.step_proba, tree.proba_offset,
+        tree.node_proba, tree.node_kprime, tree.k_lo, tree.k_hi, tree.df, K, is_call, is_american,
+        values, ctx.work, ctx.child,
+    )
+
+
+@njit(fastmath=True, cache=True)
+def _rolling_backward_kernel(S0, N, alpha, log_alpha, exp_r_dt, exp_sig2_dt, df,
+                             has_div, div_fixed, div_prop, K, is_call, is_american, n_chunks,
+                             smoothing, r, sigma, dt, boundary, trunk, work, child_buf, head):
+    """
+    Récurrence arrière sans arbre stocké : chaque niveau (prix et
+    probabilités locales) est reconstruit à la volée de la maturité vers la
+    racine. Seuls le tronc (trunk, N+1), deux colonnes de valeurs et les
+    tampons du niveau (work (6, 2N+1), child_buf) sont utilisés, soit une
+    mémoire O(N) fournie par le PricingContext. Les niveaux
+    larges sont répartis sur n_chunks threads ; smoothing active le lissage
+    Black-Scholes du dernier pas. En américain, les niveaux sont évalués par
+    _american_level et la frontière d’exercice est écrite dans boundary ;
+    les valeurs des premiers niveaux sont copiées dans head.
+    """
+    a2 = alpha * alpha
+    exp2r = exp_r_dt * exp_r_dt
+
+    build_trunk(S0, N, exp_r_dt, has_div, div_fixed, div_prop, trunk)
+
+    W = 2 * N + 1
+    V, V_new, exer = work[0], work[1], work[2]
+    wD, wM, wU = work[3], work[4], work[5]
+
+    # Payoff à maturité
+    _fill_level_payoff(trunk[N], log_alpha, -N, K, is_call, V, W, n_chunks)
+    _capture_head(head, N, -N, V, W)
+    split = _exercise_split(V, V, 0, W, is_call)
+    if is_american:
+        boundary[N] = _boundary_price(trunk[N], log_alpha, -N, W, split, is_call)
+    last_div = -1
+    for i in range(N):
+        if has_div[i]:
+            last_div = i
+
+    for i in range(N - 1, -1, -1):
+        mid_ref = trunk[i]
+        width = 2 * i + 1
+        n_child = 0
+
+        if has_div[i]:
+            # Enfants du noeud k en k′-1, k′, k′+1 : indice k′ + i au niveau i+1
+            div = div_fixed[i] + div_prop[i] * mid_ref
+            for j in range(width):
+                pD, pM, pU, kp = node_probabilities(
+                    mid_ref * math.exp(log_alpha * (j - i)), i, alpha, a2, log_alpha,
+                    exp_r_dt, exp2r, exp_sig2_dt, trunk[i + 1], div, True,
+                )
+                wD[j], wM[j], wU[j] = df * pD, df * pM, df * pU
+                child_buf[j] = kp + i
+            n_child = width
+        else:
+            # Pas sans dividende : triplet constant calculé au noeud du tronc
+            pD, pM, pU, kp = node_probabilities(
+                mid_ref, i, alpha, a2, log_alpha, exp_r_dt, exp2r, exp_sig2_dt,
+                trunk[i + 1], 0.0, False,
+            )
+            wD[:width] = df * pD
+            wM[:width] = df * pM
+            wU[:width] = df * pU
+        child = child_buf[:n_child]
+
+        if smoothing and i == N - 1:
+            div = div_fixed[i] + div_prop[i] * mid_ref if has_div[i] else 0.0
+            _smoothed_level(mid_ref, log_alpha, -i, K, is_call, is_american,
+                            r, sigma, dt, div, V_new[:width])
+            if is_american:
+                _level_payoff(mid_ref, log_alpha, -i, K, is_call, exer, 0, width)
+                split = _exercise_split(V_new, exer, 0, width, is_call)
+        elif is_american:
+            split = _american_level(V[:width + 2], wD, wM, wU, 0, child, mid_ref, log_alpha, -i,
+                                    K, is_call, V_new[:width], exer, 0, width,
+                                    split - 1, False, i <= last_div, n_chunks)
+        else:
+            _sweep_level(V[:width + 2], wD, wM, wU, 0, child, exer, False, V_new[:width],
+                         0, width, n_chunks)
+        if is_american:
+            boundary[i] = _boundary_price(mid_ref, log_alpha, -i, width, split, is_call)
+        _capture_head(head, i, -i, V_new, width)
+
+        V, V_new = V_new, V
+
+    return V[0]
+
+
+def price_backward_rolling(tree, n_threads=None):
+    """
+    Calcule uniquement le prix à la racine, en mémoire O(N).
+
+    Seuls les paramètres scalaires de tree sont utilisés : build_tree n’a
+    pas besoin d’être appelé et aucun noeud n’est conservé. Adapté aux
+    appels répétés (bumps de Greeks, balayages de paramètres). Les niveaux
+    larges sont répartis sur n_threads threads (voir price_backward). La
+    frontière d’exercice américaine est stockée dans tree.exercise_boundary.
+    Les tampons sont pris dans tree.context et les premiers niveaux sont
+    stockés dans tree.head_values, comme pour price_backward.
+    """
+    option = tree.option
+    is_american = tree.exercise == "american"
+    N = tree.N
+    ctx = tree.context if tree.context is not None else PricingContext(N)
+    has_div, div_fixed, div_prop = get_dividend_schedule(
+        tree.market, N, tree.dt,
+        out=(ctx.buffer("has_div", N, np.bool_), ctx.buffer("div_fixed", N),
+             ctx.buffer("div_prop", N)),
+        t_start=tree.t_start,
+    )
+    boundary = ctx.boundary
+    boundary[:] = np.nan
+    tree.exercise_boundary = boundary if is_american else None
+    ctx.head[:] = np.nan
+    tree.head_values = ctx.head
+
+    with _thread_count(n_threads) as n_chunks:
+        return float(_rolling_backward_kernel(
+            float(tree.S_root), tree.N, tree.alpha, tree.log_alpha,
+            tree.exp_r_dt, tree.exp_sig2_dt, tree.df,
+            has_div, div_fixed, div_prop,
+            float(option.K), option.is_call, is_american, n_chunks,
+            tree.smoothing, tree.r, tree.sigma, tree.dt, boundary,
+            tree.trunk, ctx.work, ctx.child, ctx.head,
+        ))
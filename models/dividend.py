@@ -15,3 +15,12 @@ class DividendPolicy:
         Calcule le montant du dividende à la date t.
         """
         return self.rho * (S0 * math.exp(-self.lam * (t - self.t0)) + S * (1 - math.exp(-self.lam * (t - self.t0))))
+
+    def coefficients(self, t: float, S0: float) -> tuple:
+        """
+        Décompose le montant du dividende à la date t sous forme affine
+        en S : amount(t, S, S0) = fixed + prop * S.
+        Permet aux noyaux compilés de calculer le dividende sans objet Python.
+        """
+        decay = math.exp(-self.lam * (t - self.t0))
+        return self.rho * S0 * decay, self.rho * (1 - decay)
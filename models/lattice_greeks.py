@@ -0,0 +1,81 @@
+import math
+
+
+def _level_fit(tree, i, S):
+    """
+    Ajustement quadratique en log S des valeurs du niveau i autour de S,
+    sur les trois noeuds les plus proches (tree.head_values).
+
+    Retour
+    ------
+    (float, float, float)
+        Valeur, dV/dlnS et d²V/dlnS² au prix S.
+    """
+    L = tree.head_values.shape[0] - 1
+    x = math.log(S / tree.trunk[i]) / tree.log_alpha
+    k = min(max(int(round(x)), 1 - i), i - 1)
+    v_down, v_mid, v_up = (float(v) for v in tree.head_values[i, k + L - 1:k + L + 2])
+    if not (math.isfinite(v_down) and math.isfinite(v_mid) and math.isfinite(v_up)):
+        raise ValueError(f"lattice_greeks : noeuds du niveau {i} hors de la bande.")
+
+    h = tree.log_alpha
+    d = x - k
+    first = (v_up - v_down) / (2.0 * h)
+    second = (v_up - 2.0 * v_mid + v_down) / (h * h)
+    value = v_mid + d * h * first + 0.5 * (d * h) ** 2 * second
+    return value, first + d * h * second, second
+
+
+def lattice_greeks(tree):
+    """
+    Prix, Delta, Gamma et Theta lus sur les valeurs d’un seul pricing
+    backward, sans rebump ni reconstruction d’arbre.
+
+    L’arbre commence lead_steps pas avant la date de pricing (deux ou
+    trois, GREEK_LEAD_STEPS par défaut) : le niveau lead_steps est centré
+    sur S0 et ses noeuds voisins S0 · alpha^±1 donnent Delta et Gamma ;
+    Theta est la différence centrée entre les niveaux lead_steps ± 1,
+    chacun interpolé en S0.
+
+    Avec dividende, l’échéancier (date et partie fixe, calculée sur S0) est
+    celui du marché : Delta ne rebumpe pas le dividende et Theta avance le
+    temps à date de dividende fixée, là où le rebump de S0 et de T les
+    déplace.
+
+    L’élagage en bande n’est pas supporté : la bande, propagée depuis la
+    racine décalée, n’est pas celle de l’arbre à N pas, et les sous-arbres
+    des noeuds voisins de S0 y sont coupés de façon asymétrique.
+
+    Paramètres
+    ----------
+    tree : TrinomialTree
+        Arbre non élagué, construit avec lead_steps = 2 ou 3 et déjà pricé
+        (price_backward ou price_backward_rolling).
+
+    Retour
+    ------
+    dict
+        Clés "Price", "Delta", "Gamma", "Theta".
+    """
+    if tree.band_threshold is not None:
+        raise ValueError("lattice_greeks : incompatible avec l’élagage en bande (pruning).")
+    if tree.head_values is None:
+        raise ValueError("lattice_greeks : l’arbre n’a pas été pricé.")
+    if not 2 <= tree.lead_steps <= tree.head_values.shape[0] - 2:
+        raise ValueError("lattice_greeks : l’arbre doit commencer deux ou trois pas avant t = 0 "
+                         f"(lead_steps = {tree.lead_steps}).")
+    if tree.N - tree.lead_steps < 1:
+        raise ValueError("lattice_greeks : au moins un pas après t = 0 est nécessaire.")
+
+    S0 = float(tree.market.S0)
+    i0 = tree.lead_steps
+    price, dV_dx, d2V_dx2 = _level_fit(tree, i0, S0)
+    before, _, _ = _level_fit(tree, i0 - 1, S0)
+    after, _, _ = _level_fit(tree, i0 + 1, S0)
+
+    return {
+        "Price": price,
+        "Delta": dV_dx / S0,
+        "Gamma": (d2V_dx2 - dV_dx) / (S0 * S0),
+        "Theta": (after - before) / (2.0 * tree.dt),
+    }
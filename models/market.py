@@ -53,3 +53,101 @@ class Market:
         """
         return bool(self.dividends)
 
+    def snapshot(self) -> "MarketSnapshot":
+        """
+        Renvoie une copie immuable et hashable des paramètres du marché.
+        """
+        if self.dividends:
+            t_div, policy = self.dividends[0]  # Unique ex-div dans ce projet
+            return MarketSnapshot(self.S0, self.r, self.sigma, self.T, t_div, self.pricing_date,
+                                  policy.rho, policy.lam)
+        return MarketSnapshot(self.S0, self.r, self.sigma, self.T, None, self.pricing_date,
+                              self.rho, self.lam)
+
+
+class MarketSnapshot:
+    """
+    Version immuable de Market : mêmes attributs (S0, r, sigma, T,
+    dividends, ...) et même interface pour les pricers, mais aucun attribut
+    ne peut être modifié. Un marché bumpé s’obtient par bumped(champ=valeur)
+    en O(1), sans copie profonde : la politique de dividende est partagée
+    tant que ses paramètres ne changent pas.
+
+    Le snapshot est hashable et comparable par valeur : il peut servir de
+    clé aux caches de treillis ou de prix.
+    """
+
+    __slots__ = ("S0", "r", "sigma", "T", "exdivdate", "pricing_date", "rho", "lam",
+                 "dividends", "_hash")
+
+    _FIELDS = ("S0", "r", "sigma", "T", "exdivdate", "pricing_date", "rho", "lam")
+
+    def __init__(self, S0: float, r: float, sigma: float, T: float,
+                 exdivdate=None, pricing_date=None,
+                 rho: float = 0.0, lam: float = 0.0, dividends=None):
+        """
+        Initialise un snapshot ; dividends permet de réutiliser la liste de
+        politiques d’un snapshot existant (voir bumped).
+        """
+        values = (float(S0), float(r), float(sigma), float(T),
+                  None if exdivdate is None else float(exdivdate), pricing_date,
+                  float(rho), float(lam))
+        for name, value in zip(self._FIELDS, values):
+            object.__setattr__(self, name, value)
+        if dividends is None:
+            dividends = ()
+            if exdivdate is not None:
+                dividends = ((float(exdivdate), DividendPolicy(rho, lam, t0=0.0)),)
+        object.__setattr__(self, "dividends", dividends)
+        object.__setattr__(self, "_hash", hash(values))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"MarketSnapshot est immuable : utiliser bumped({name}=...).")
+
+    def __delattr__(self, name):
+        raise AttributeError("MarketSnapshot est immuable.")
+
+    def _values(self) -> tuple:
+        """
+        Paramètres du snapshot, dans l’ordre de _FIELDS.
+        """
+        return tuple(getattr(self, name) for name in self._FIELDS)
+
+    def __eq__(self, other):
+        if not isinstance(other, MarketSnapshot):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._FIELDS)
+        return f"MarketSnapshot({fields})"
+
+    def has_dividend(self) -> bool:
+        """
+        Retourne True si un dividende est défini dans le marché.
+        """
+        return bool(self.dividends)
+
+    def snapshot(self) -> "MarketSnapshot":
+        """
+        Un snapshot est déjà immuable : renvoie self.
+        """
+        return self
+
+    def bumped(self, **changes) -> "MarketSnapshot":
+        """
+        Renvoie un nouveau snapshot dont les champs donnés sont remplacés,
+        par exemple market.bumped(sigma=0.21, S0=101.0).
+        """
+        unknown = changes.keys() - set(self._FIELDS)
+        if unknown:
+            raise ValueError(f"MarketSnapshot : champ inconnu '{unknown.pop()}'.")
+        values = [changes.get(name, getattr(self, name)) for name in self._FIELDS]
+        dividends = None
+        if changes.keys().isdisjoint(("exdivdate", "rho", "lam")):
+            dividends = self.dividends
+        return MarketSnapshot(*values, dividends=dividends)
+
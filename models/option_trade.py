@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from models.payoffs import call_payoff, put_payoff
 
 @dataclass
 class Option:
@@ -8,11 +9,10 @@ class Option:
     K: float             # Strike de l'option
     is_call: bool = True # Type de l'option: Call = True, Put = False
 
-    def payoff(self, S: float) -> float:
+    def payoff(self, S):
         """
-        Calcule le payoff de l’option à l’échéance en fonction du prix du sous-jacent.
+        Calcule le payoff de l’option à l’échéance en fonction du prix du
+        sous-jacent : S peut être un scalaire ou un tableau (niveau entier).
         """
-        if self.is_call:
-            return max(S - self.K, 0)
-        else:
-            return max(self.K - S, 0)
\ No newline at end of file
+        payoff = call_payoff if self.is_call else put_payoff
+        return payoff(S, float(self.K))
\ No newline at end of file
@@ -0,0 +1,32 @@
+from numba import njit, vectorize
+
+
+# --- Payoffs élémentaires ---
+# Chaque payoff est un ufunc NumPy compilé (S, K) -> payoff : appelé sur un
+# tableau, il évalue tout un niveau sans boucle Python ; appelé sur des
+# scalaires, il s’utilise directement dans les noyaux numba. Les noyaux
+# ne connaissent que le call et le put (vanilla_payoff) : leur frontière
+# d’exercice et leur troncature dépendent de cette orientation.
+
+@vectorize(["float64(float64, float64)"], fastmath=True, cache=True)
+def call_payoff(S, K):
+    """
+    Payoff d’un call : max(S - K, 0).
+    """
+    return max(S - K, 0.0)
+
+
+@vectorize(["float64(float64, float64)"], fastmath=True, cache=True)
+def put_payoff(S, K):
+    """
+    Payoff d’un put : max(K - S, 0).
+    """
+    return max(K - S, 0.0)
+
+
+@njit(fastmath=True, cache=True)
+def vanilla_payoff(S, K, is_call):
+    """
+    Payoff d’une option vanille, utilisable dans les noyaux compilés.
+    """
+    return call_payoff(S, K) if is_call else put_payoff(S, K)
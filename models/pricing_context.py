@@ -0,0 +1,56 @@
+import numpy as np
+from utils.utils_constants import GREEK_LEAD_STEPS
+
+
+class PricingContext:
+    """
+    Espace de travail réutilisable pour les pricings backward d’un arbre à
+    N pas : tableaux par pas de l’arbre (tronc, probabilités, bandes,
+    dividendes), colonnes de valeurs et tampons de niveau des noyaux,
+    valeurs de l’arbre complet (option_value) et matrices du pricing groupé.
+
+    Un arbre construit avec un contexte (TrinomialTree(..., context=ctx))
+    et les pricings qui l’utilisent prennent leurs tableaux dans le contexte
+    au lieu de les allouer : des appels répétés (bumps de Greeks,
+    balayages) à N fixé ne réallouent rien. En contrepartie, les tableaux
+    d’un arbre (et sa frontière d’exercice) sont réutilisés par la
+    construction ou le pricing suivant sur le même contexte : un contexte
+    sert à un seul pricing à la fois.
+    """
+
+    def __init__(self, N: int):
+        """
+        Alloue les tampons des noyaux pour des arbres à N pas.
+
+        Paramètres
+        ----------
+        N : int
+            Nombre d’étapes temporelles des arbres évalués.
+        """
+        W = 2 * N + 1
+        self.N = N
+        self.work = np.empty((6, W), dtype=np.float64)   # V, V_new, exer, wD, wM, wU
+        self.child = np.empty(W, dtype=np.int64)         # Premiers enfants (pas avec dividende)
+        self.boundary = np.empty(N + 1, dtype=np.float64)  # Frontière d’exercice
+        self.head = np.empty((2 * GREEK_LEAD_STEPS + 1, 4 * GREEK_LEAD_STEPS + 1))  # Premiers niveaux
+        self._buffers = {}
+
+    def check(self, N: int):
+        """
+        Vérifie que le contexte est dimensionné pour un arbre à N pas.
+        """
+        if N != self.N:
+            raise ValueError(f"PricingContext dimensionné pour N={self.N}, arbre à N={N}.")
+
+    def buffer(self, name: str, shape, dtype=np.float64) -> np.ndarray:
+        """
+        Renvoie le tableau de travail name, de forme shape (non initialisé).
+        Le tableau n’est alloué qu’au premier appel, ou si la taille
+        demandée dépasse celle du tableau existant.
+        """
+        size = int(np.prod(shape))
+        buf = self._buffers.get(name)
+        if buf is None or buf.size < size or buf.dtype != dtype:
+            buf = np.empty(size, dtype=dtype)
+            self._buffers[name] = buf
+        return buf[:size].reshape(shape)
@@ -47,10 +47,35 @@ def local_probabilities(
     """
 
     exp_r_dt = math.exp(r * dt)
-    a2 = a * a
-    exp2r = exp_r_dt * exp_r_dt
-    loga = math.log(a)
+    return node_probabilities(
+        S_i_k, i, a, a * a, math.log(a), exp_r_dt, exp_r_dt * exp_r_dt,
+        exp_sig2_dt, trunk_next, div, has_dividend,
+    )
 
+
+@njit(fastmath=True, cache=True)
+def node_probabilities(
+    S_i_k: float,
+    i: int,
+    a: float,
+    a2: float,
+    loga: float,
+    exp_r_dt: float,
+    exp2r: float,
+    exp_sig2_dt: float,
+    trunk_next: float,
+    div: float,
+    has_dividend: bool,
+) -> tuple:
+    """
+    Noyau de local_probabilities avec les constantes du pas pré-calculées
+    (a², log(a), exp(r·dt), exp(2r·dt)), appelé depuis les noyaux compilés
+    de construction de l’arbre.
+
+    Retourne
+    --------
+    tuple : (p_down, p_mid, p_up, kprime)
+    """
     E = S_i_k * exp_r_dt - div if has_dividend else S_i_k * exp_r_dt
     V = (S_i_k * S_i_k) * exp2r * (exp_sig2_dt - 1.0)
 
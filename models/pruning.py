@@ -1,84 +1,128 @@
-import math
+import numpy as np
+from numba import njit
 
-def compute_reach_probabilities(tree):
-    """
-    Calcule et stocke la probabilité d’atteinte (p_reach) de chaque nœud
-    dans un arbre trinomial utilisant des Nodes statiques.
 
-    Hypothèses :
-      - tree.tree est une liste de niveaux [[Node, Node, ...], ...]
-      - Chaque Node possède : p_down, p_mid, p_up
-      - Aucun Node ne référence directement tree
+@njit(fastmath=True, cache=True)
+def _forward_reach_kernel(N, step_proba, proba_offset, node_proba, node_kprime, k_lo,
+                          level_offset, p_reach):
+    """
+    Propagation vers l’avant des probabilités d’atteinte, en une seule passe
+    compilée sur les tableaux plats (niveau i à l’offset level_offset[i]).
+
+    Seuls les noeuds de la bande de chaque niveau sont parcourus. Le nœud
+    (i, k) envoie ses enfants en k-1, k, k+1 au niveau i+1 (en k′-1, k′,
+    k′+1 sur un pas avec dividende) ; la masse envoyée hors de la bande du
+    niveau i+1 est perdue.
+
+    Retour
+    ------
+    float
+        Somme des p_reach du dernier niveau (avant normalisation).
     """
+    p_reach[:] = 0.0
+    p_reach[0] = 1.0
+
+    for i in range(N):
+        offset = level_offset[i]
+        p_offset = proba_offset[i]
+        next_offset = level_offset[i + 1]
+        next_width = level_offset[i + 2] - next_offset
+        shift = k_lo[i] - 1 - k_lo[i + 1]
+        pD, pM, pU = step_proba[i, 0], step_proba[i, 1], step_proba[i, 2]
+
+        for j in range(next_offset - offset):
+            reach = p_reach[offset + j]
+            if reach <= 0.0:
+                continue
 
-    # --- Étape 1 : réinitialisation ---
-    for level in tree.tree:
-        for node in level:
-            if node is not None:
-                node.p_reach = 0.0
+            c = j + shift
+            if p_offset >= 0:
+                pD = node_proba[p_offset + j, 0]
+                pM = node_proba[p_offset + j, 1]
+                pU = node_proba[p_offset + j, 2]
+                c = node_kprime[p_offset + j] - 1 - k_lo[i + 1]
 
-    # Racine
-    root = tree.tree[0][0]
-    root.p_reach = 1.0
+            if 0 <= c < next_width:
+                p_reach[next_offset + c] += reach * pD
+            if 0 <= c + 1 < next_width:
+                p_reach[next_offset + c + 1] += reach * pM
+            if 0 <= c + 2 < next_width:
+                p_reach[next_offset + c + 2] += reach * pU
 
-    # --- Étape 2 : propagation des probabilités vers l’avant ---
-    for i in range(tree.N):
-        current_level = tree.tree[i]
-        next_level = tree.tree[i + 1]
-        n_next = len(next_level)
+    total = 0.0
+    for idx in range(level_offset[N], level_offset[N + 1]):
+        total += p_reach[idx]
+    return total
 
-        for j, node in enumerate(current_level):
-            if node is None or node.p_reach <= 0.0:
-                continue
 
-            pD, pM, pU = node.p_down, node.p_mid, node.p_up
-            if pD == 0 and pM == 0 and pU == 0:
-                continue
+@njit(fastmath=True, cache=True)
+def _reach_bands(k_lo, level_offset, p_reach, threshold, new_k_lo, new_k_hi):
+    """
+    Calcule la bande conservée de chaque niveau : du premier au dernier
+    noeud dont p_reach atteint le seuil. La distribution d’atteinte d’un
+    niveau étant unimodale, ces noeuds sont contigus. Si aucun noeud
+    n’atteint le seuil, le noeud le plus probable est conservé.
+    """
+    for i in range(len(k_lo)):
+        offset = level_offset[i]
+        lo, hi, best = -1, -1, 0
+        for j in range(level_offset[i + 1] - offset):
+            r = p_reach[offset + j]
+            if r >= threshold:
+                if lo < 0:
+                    lo = j
+                hi = j
+            if r > p_reach[offset + best]:
+                best = j
+        if lo < 0:
+            lo, hi = best, best
+        new_k_lo[i] = k_lo[i] + lo
+        new_k_hi[i] = k_lo[i] + hi
 
-            k_rel = j - i  # position relative du nœud dans le niveau i
 
-            # ---- Propagation individuelle ----
-            if pD > 0:
-                idx_d = k_rel - 1 + (i + 1)
-                if 0 <= idx_d < n_next and next_level[idx_d] is not None:
-                    next_level[idx_d].p_reach += node.p_reach * pD
+def compute_reach_probabilities(tree):
+    """
+    Calcule et stocke la probabilité d’atteinte (p_reach) de chaque nœud
+    dans un arbre trinomial stocké en tableaux plats.
 
-            if pM > 0:
-                idx_m = k_rel + (i + 1)
-                if 0 <= idx_m < n_next and next_level[idx_m] is not None:
-                    next_level[idx_m].p_reach += node.p_reach * pM
+    Hypothèses :
+      - tree.step_proba / tree.node_proba contiennent les probabilités
+        locales (voir TrinomialTree.build_tree)
+      - les nœuds élagués ne font pas partie des bandes [k_lo, k_hi]
+    """
+    p_reach = np.empty(tree.n_nodes, dtype=np.float64)
 
-            if pU > 0:
-                idx_u = k_rel + 1 + (i + 1)
-                if 0 <= idx_u < n_next and next_level[idx_u] is not None:
-                    next_level[idx_u].p_reach += node.p_reach * pU
+    total = _forward_reach_kernel(
+        tree.N, tree.step_proba, tree.proba_offset, tree.node_proba, tree.node_kprime,
+        tree.k_lo, tree.level_offset, p_reach,
+    )
 
-    # --- Étape 3 : normalisation (pour éviter dérives d’arrondi) ---
-    total = sum(node.p_reach for node in tree.tree[-1] if node)
+    # Normalisation (pour éviter dérives d’arrondi)
     if total > 0:
-        inv_total = 1.0 / total
-        for level in tree.tree:
-            for node in level:
-                if node is not None:
-                    node.p_reach *= inv_total
+        p_reach *= 1.0 / total
+
+    tree.p_reach = p_reach
 
 
 def prune_tree(tree, threshold=1e-7):
     """
-    Supprime (met à None) les nœuds dont la probabilité d’atteinte p_reach
-    est inférieure à un seuil donné.
+    Réduit la bande de chaque niveau aux nœuds dont la probabilité
+    d’atteinte p_reach atteint un seuil donné ; les tableaux par nœud sont
+    compactés sur les nouvelles bandes (voir TrinomialTree.restrict_bands).
+    Les p_reach sont calculées au préalable si nécessaire.
 
     Paramètres
     ----------
     tree : TrinomialTree
-        Arbre trinomial avec les p_reach déjà calculées.
+        Arbre trinomial construit.
     threshold : float
         Seuil minimal sous lequel un nœud est supprimé.
-    verbose : bool
-        Si True, affiche le nombre de nœuds supprimés.
     """
-    for level in tree.tree:
-        for j, node in enumerate(level):
-            if node is not None and node.p_reach < threshold:
-                level[j] = None
-
+    if tree.p_reach is None:
+        compute_reach_probabilities(tree)
+
+    new_k_lo = np.empty_like(tree.k_lo)
+    new_k_hi = np.empty_like(tree.k_hi)
+    _reach_bands(tree.k_lo, tree.level_offset, tree.p_reach, float(threshold),
+                 new_k_lo, new_k_hi)
+    tree.restrict_bands(new_k_lo, new_k_hi)
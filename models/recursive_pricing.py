@@ -1,57 +1,184 @@
-import functools
-import sys
-sys.setrecursionlimit(3000)  
+import math
+import numpy as np
+from numba import njit
+from models.backward_pricing import _smoothed_value
+from models.payoffs import vanilla_payoff
 
-import functools
 
-# cache global, isolé par arbre
-_GLOBAL_RECURSIVE_CACHE = {}
-
-def recursive_cache():
+class RecursiveContext:
     """
-    Décorateur avec cache séparé par arbre.
-    Chaque arbre (TrinomialTree) dispose de son propre cache,
-    qui est automatiquement créé puis supprimé après le pricing.
-    Cela évite les dérivées nulles lors des tests de Greeks.
+    Contexte d’un pricing récursif : mémo des valeurs par noeud (indexé
+    comme les tableaux plats de l’arbre, via level_offset) et bitmap des
+    noeuds déjà calculés. Le mémo appartient au contexte et disparaît avec
+    lui ; deux pricings simultanés n’ont aucun état partagé.
     """
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(tree, i=0, k=0, cache=None):
-            tree_id = id(tree)
-
-            # Crée un cache spécifique à cet arbre
-            if tree_id not in _GLOBAL_RECURSIVE_CACHE:
-                _GLOBAL_RECURSIVE_CACHE[tree_id] = {}
-
-            local_cache = _GLOBAL_RECURSIVE_CACHE[tree_id]
-            key = (i, k)
-
-            if key in local_cache:
-                return local_cache[key]
 
-            result = func(tree, i, k, local_cache)
-            local_cache[key] = result
-            return result
-        return wrapper
-    return decorator
+    def __init__(self, tree):
+        """
+        Alloue le mémo pour un arbre construit.
+
+        Paramètres
+        ----------
+        tree : TrinomialTree
+            Arbre trinomial déjà construit.
+        """
+        self.tree = tree
+        self.value = np.zeros(tree.n_nodes, dtype=np.float64)
+        self.computed = np.zeros(tree.n_nodes, dtype=np.bool_)
+
+    def price(self, i=0, k=0):
+        """
+        Valeur de l’option au noeud (i, k) ; les noeuds déjà évalués par ce
+        contexte ne sont pas recalculés.
+        """
+        tree = self.tree
+
+        # --- Nœud hors bande (élagué) : valeur nulle ---
+        if not tree.node_active(i, k):
+            return 0.0
+
+        return float(_recursive_kernel(
+            i, k - tree.k_lo[i], tree.trunk, tree.log_alpha, tree.step_proba,
+            tree.proba_offset, tree.node_proba, tree.node_kprime, tree.k_lo, tree.level_offset,
+            tree.df, float(tree.option.K), tree.option.is_call,
+            tree.exercise == "american",
+            tree.truncation_tol is not None, tree.cone_lo, tree.cone_hi,
+            tree.smoothing, tree.r, tree.sigma, tree.dt, float(tree.div_step[-1]) if tree.N else 0.0,
+            self.value, self.computed,
+        ))
+
+
+@njit(fastmath=True, cache=True)
+def _recursive_kernel(i0, j0, trunk, log_alpha, step_proba, proba_offset, node_proba,
+                      node_kprime, k_lo, level_offset, df, K, is_call, is_american,
+                      truncate, cone_lo, cone_hi, smoothing, r, sigma, dt, div_last,
+                      memo, computed):
+    """
+    Évaluation descendante mémoïsée du noeud (i0, j0), sans récursion :
+    une pile explicite remplace les appels récursifs. Un noeud n’est évalué
+    qu’une fois ses enfants (dans la bande du niveau suivant) calculés ;
+    seuls les noeuds atteignables depuis (i0, j0) sont visités. Sur un pas
+    avec dividende, les enfants du noeud k sont en k′-1, k′, k′+1
+    (node_kprime).
 
+    Paramètres
+    ----------
+    i0, j0 : int
+        Niveau et position dans la bande (k - k_lo[i0]) du noeud de départ.
+    truncate : bool
+        Si vrai, un noeud dont le cône atteignable (cone_lo, cone_hi) est
+        entièrement hors de la monnaie vaut 0 sans être développé. Ignoré
+        avec smoothing, où cette coupe n’est plus exacte.
+    smoothing : bool
+        Si vrai, les noeuds du niveau N-1 prennent le prix Black-Scholes sur
+        dt (r, sigma, dt ; dividende div_last versé sur le dernier pas).
+    memo, computed : np.ndarray
+        Valeurs et bitmap « calculé » par noeud (indices plats) du
+        RecursiveContext.
 
-def clear_recursive_cache(tree=None):
-    """
-    Supprime le cache global ou celui d’un arbre spécifique.
-    À appeler à la fin de chaque pricing pour éviter les interférences
-    entre les appels successifs (ex: calculs de Greeks).
+    Retour
+    ------
+    float
+        Valeur de l’option au noeud (i0, j0).
     """
-    if tree is None:
-        _GLOBAL_RECURSIVE_CACHE.clear()
-    else:
-        _GLOBAL_RECURSIVE_CACHE.pop(id(tree), None)
-
-@recursive_cache()
-def price_recursive(tree, i=0, k=0, cache=None):
+    N = len(trunk) - 1
+    # Chaque développement empile au plus trois enfants au-dessus du noeud
+    # courant, un niveau plus loin : la pile reste en O(N).
+    size = 3 * (N - i0) + 1
+    stack_i = np.empty(size, dtype=np.int64)
+    stack_j = np.empty(size, dtype=np.int64)
+    stack_i[0] = i0
+    stack_j[0] = j0
+    top = 1
+
+    while top > 0:
+        i = stack_i[top - 1]
+        j = stack_j[top - 1]
+        idx = level_offset[i] + j
+        if computed[idx]:
+            top -= 1
+            continue
+
+        k = k_lo[i] + j
+        S = trunk[i] * math.exp(log_alpha * k)
+
+        # --- Cas terminal : maturité ---
+        if i == N:
+            memo[idx] = vanilla_payoff(S, K, is_call)
+            computed[idx] = True
+            top -= 1
+            continue
+
+        # --- Lissage Black-Scholes du dernier pas ---
+        if smoothing and i == N - 1:
+            memo[idx] = _smoothed_value(S, K, is_call, is_american, r, sigma, dt, div_last)
+            computed[idx] = True
+            top -= 1
+            continue
+
+        # --- Troncature : aucun noeud atteignable dans la monnaie ---
+        # (pas avec le lissage : le prix Black-Scholes du niveau N-1 reste
+        # positif hors de la monnaie)
+        if truncate and not smoothing:
+            scale = math.exp(log_alpha * k)
+            if (is_call and scale * cone_hi[i] <= K) or (not is_call and scale * cone_lo[i] >= K):
+                memo[idx] = 0.0
+                computed[idx] = True
+                top -= 1
+                continue
+
+        # --- Enfants (hors bande : valeur nulle) ---
+        offset = proba_offset[i]
+        next_offset = level_offset[i + 1]
+        next_width = level_offset[i + 2] - next_offset
+        if offset < 0:
+            c = j + k_lo[i] - 1 - k_lo[i + 1]
+        else:
+            c = node_kprime[offset + j] - 1 - k_lo[i + 1]
+        pending = False
+        for cc in range(c, c + 3):
+            if 0 <= cc < next_width and not computed[next_offset + cc]:
+                stack_i[top] = i + 1
+                stack_j[top] = cc
+                top += 1
+                pending = True
+        if pending:
+            continue
+
+        # --- Données locales ---
+        if offset < 0:
+            pD, pM, pU = step_proba[i, 0], step_proba[i, 1], step_proba[i, 2]
+        else:
+            pD = node_proba[offset + j, 0]
+            pM = node_proba[offset + j, 1]
+            pU = node_proba[offset + j, 2]
+
+        v_down = memo[next_offset + c] if 0 <= c < next_width else 0.0
+        v_mid = memo[next_offset + c + 1] if 0 <= c + 1 < next_width else 0.0
+        v_up = memo[next_offset + c + 2] if 0 <= c + 2 < next_width else 0.0
+
+        continuation = df * (pD * v_down + pM * v_mid + pU * v_up)
+
+        # --- Cas américain : comparaison avec exercice anticipé ---
+        if is_american:
+            memo[idx] = max(vanilla_payoff(S, K, is_call), continuation)
+        else:
+            memo[idx] = continuation
+        computed[idx] = True
+        top -= 1
+
+    return memo[level_offset[i0] + j0]
+
+
+def price_recursive(tree, i=0, k=0, context=None):
     """
     Calcule le prix d’une option par la méthode récursive sur un arbre trinomial.
 
+    La récursion (valeur d’un noeud = espérance actualisée de ses trois
+    enfants, mémoïsée) est déroulée dans un noyau compilé sur une pile
+    explicite : aucune limite de profondeur, et seuls les noeuds
+    atteignables depuis (i, k) sont évalués.
+
     Paramètres
     ----------
     tree : TrinomialTree
@@ -60,63 +187,15 @@ def price_recursive(tree, i=0, k=0, cache=None):
         Indice de l’étape temporelle (0 = racine).
     k : int
         Décalage relatif au nœud central (indice horizontal).
-    cache : dict
-        Cache partagé entre les appels récursifs (par arbre).
+    context : RecursiveContext ou None
+        Mémo à réutiliser entre appels sur le même arbre ; par défaut un
+        contexte propre à l’appel est créé puis libéré.
 
     Retour
     -------
     float
         Valeur de l’option au nœud (i, k).
     """
-
-    # Vérifie si le résultat est déjà en cache
-    key = (i, k)
-    if cache is not None and key in cache:
-        return cache[key]
-
-    # --- Cas terminal : maturité ---
-    if i >= tree.N:
-        idx = i + k
-        node = tree.tree[i][idx] if 0 <= idx < len(tree.tree[i]) else None
-        value = 0.0 if node is None else tree.option.payoff(node.stock_price)
-        if cache is not None:
-            cache[key] = value
-        return value
-
-    # --- Nœud courant ---
-    idx = i + k
-    if idx < 0 or idx >= len(tree.tree[i]):
-        if cache is not None:
-            cache[key] = 0.0
-        return 0.0
-
-    node = tree.tree[i][idx]
-    if node is None:
-        if cache is not None:
-            cache[key] = 0.0
-        return 0.0
-
-    # --- Données locales ---
-    S = node.stock_price
-    pD, pM, pU = node.p_down, node.p_mid, node.p_up
-    df = tree.df
-
-    # --- Appels récursifs ---
-    v_down = price_recursive(tree, i + 1, k - 1)
-    v_mid  = price_recursive(tree, i + 1, k)
-    v_up   = price_recursive(tree, i + 1, k + 1)
-
-    continuation = df * (pD * v_down + pM * v_mid + pU * v_up)
-
-    # --- Cas américain : comparaison avec exercice anticipé ---
-    if tree.exercise == "american":
-        exercise_val = tree.option.payoff(S)
-        value = max(exercise_val, continuation)
-    else:
-        value = continuation
-
-    # --- Sauvegarde dans le cache ---
-    if cache is not None:
-        cache[key] = value
-
-    return value
+    if context is None:
+        context = RecursiveContext(tree)
+    return context.price(i, k)
@@ -0,0 +1,179 @@
+import math
+import numpy as np
+from numba import njit
+from models.backward_pricing import _batch_backward_kernel
+from models.tree_builder import build_lattice, build_layout
+
+SCENARIO_FIELDS = ("S0", "r", "sigma", "T")
+
+
+@njit(fastmath=True, cache=True)
+def _scenario_kernel(group_start, order, S0, r, sigma, T, t_div, div_fixed, div_prop,
+                     N, K, is_call, is_american, band_threshold, prices):
+    """
+    Construit et price tous les scénarios de marché en un seul appel.
+
+    Les scénarios sont parcourus par groupe : order[group_start[g]:
+    group_start[g+1]] sont les scénarios du groupe g, qui partagent r,
+    sigma, T et le dividende et ne diffèrent que par S0. Le treillis du
+    premier scénario du groupe (S0_ref) est construit une seule fois ;
+    l’arbre étant homogène en S0, le scénario s se price sur ce treillis
+    comme le contrat de strike K · S0_ref / S0[s], sa valeur étant
+    multipliée par S0[s] / S0_ref. Tous les contrats d’un groupe sont
+    évalués par une seule récurrence arrière (_batch_backward_kernel).
+
+    Paramètres
+    ----------
+    S0, r, sigma, T : np.ndarray
+        Paramètres de marché de chaque scénario.
+    t_div, div_fixed, div_prop : np.ndarray
+        Date et coefficients du dividende de chaque scénario (t_div < 0 :
+        pas de dividende).
+    band_threshold : float
+        Seuil d’élagage à la construction (0 : arbre complet).
+    prices : np.ndarray
+        Prix de chaque scénario, rempli en place.
+    """
+    W = 2 * N + 1
+    trunk = np.empty(N + 1)
+    step_proba = np.empty((N, 3))
+    k_lo = np.empty(N + 1, dtype=np.int64)
+    k_hi = np.empty(N + 1, dtype=np.int64)
+    level_offset = np.empty(N + 2, dtype=np.int64)
+    proba_offset = np.empty(N, dtype=np.int64)
+    reach_buf = np.empty((2, W))
+    has_div = np.empty(N, dtype=np.bool_)
+    fixed = np.empty(N)
+    prop = np.empty(N)
+    stock_price = np.empty(0)
+    # Tampons de la récurrence groupée, dimensionnés pour le plus grand groupe
+    C_max = 0
+    for g in range(len(group_start) - 1):
+        C_max = max(C_max, group_start[g + 1] - group_start[g])
+    values = np.empty((2, C_max * W))
+    work = np.empty((6, W))
+    child_buf = np.empty(W, dtype=np.int64)
+
+    for g in range(len(group_start) - 1):
+        lo, hi = group_start[g], group_start[g + 1]
+        ref = order[lo]
+
+        # --- Paramètres de l’arbre (voir TrinomialTree) ---
+        dt = T[ref] / N
+        df = math.exp(-r[ref] * dt)
+        alpha = math.exp(sigma[ref] * math.sqrt(3.0 * dt))
+        log_alpha = math.log(alpha)
+        exp_r_dt = math.exp(r[ref] * dt)
+        exp_sig2_dt = math.exp(sigma[ref] ** 2 * dt)
+
+        # --- Échéancier des dividendes (voir get_dividend_schedule) ---
+        for i in range(N):
+            has_div[i] = i * dt < t_div[ref] < (i + 1) * dt
+            fixed[i] = div_fixed[ref] if has_div[i] else 0.0
+            prop[i] = div_prop[ref] if has_div[i] else 0.0
+
+        # --- Treillis du scénario de référence ---
+        step_proba[:] = 0.0
+        build_layout(S0[ref], N, alpha, log_alpha, exp_r_dt, exp_sig2_dt,
+                     has_div, fixed, prop, band_threshold, trunk, step_proba, k_lo, k_hi,
+                     reach_buf)
+        level_offset[0] = 0
+        n_div_nodes = 0
+        for i in range(N + 1):
+            width = k_hi[i] - k_lo[i] + 1
+            level_offset[i + 1] = level_offset[i] + width
+            if i < N:
+                proba_offset[i] = n_div_nodes if has_div[i] else -1
+                if has_div[i]:
+                    n_div_nodes += width
+        node_proba = np.empty((n_div_nodes, 3))
+        node_kprime = np.empty(n_div_nodes, dtype=np.int64)
+        build_lattice(N, alpha, log_alpha, exp_r_dt, exp_sig2_dt, has_div, fixed, prop,
+                      trunk, k_lo, level_offset, proba_offset, stock_price,
+                      node_proba, node_kprime)
+
+        # --- Un contrat par scénario, strike ramené au treillis de référence ---
+        C = hi - lo
+        K_c = np.empty(C)
+        call_c = np.empty(C, dtype=np.bool_)
+        american_c = np.empty(C, dtype=np.bool_)
+        for c in range(C):
+            K_c[c] = K * S0[ref] / S0[order[lo + c]]
+            call_c[c] = is_call
+            american_c[c] = is_american
+        group_prices = _batch_backward_kernel(trunk, log_alpha, step_proba, proba_offset,
+                                              node_proba, node_kprime, k_lo, k_hi, df, K_c,
+                                              call_c, american_c, values, work, child_buf)
+        for c in range(C):
+            s = order[lo + c]
+            prices[s] = group_prices[c] * S0[s] / S0[ref]
+
+
+def price_scenarios(market, option, N, exercise, scenarios, band_threshold=None):
+    """
+    Prix d’une option sous une liste de scénarios de marché (bumps), en un
+    seul appel compilé.
+
+    Chaque scénario est un dictionnaire de paramètres de marché remplacés
+    (clés parmi SCENARIO_FIELDS, par exemple {"S0": 101.0, "sigma": 0.21}) ;
+    les autres paramètres sont ceux de market. Comme pour un Market bumpé,
+    le dividende garde sa date et sa partie fixe est recalculée sur le S0
+    du scénario. Les scénarios qui ne diffèrent que par S0 partagent un
+    même treillis (sans dividende fixe, l’arbre est homogène en S0) et sont
+    pricés ensemble.
+
+    Paramètres
+    ----------
+    market : Market
+        Marché de base.
+    option : Option
+        Contrat évalué.
+    N : int
+        Nombre d’étapes temporelles.
+    exercise : str
+        "european" ou "american".
+    scenarios : list[dict]
+        Bumps de marché de chaque scénario.
+    band_threshold : float ou None
+        Seuil d’élagage à la construction, comme pour TrinomialTree.
+
+    Retour
+    ------
+    np.ndarray
+        Prix de chaque scénario, dans l’ordre de scenarios.
+    """
+    n = len(scenarios)
+    params = {name: np.full(n, float(getattr(market, name))) for name in SCENARIO_FIELDS}
+    for s, bumps in enumerate(scenarios):
+        for name, value in bumps.items():
+            if name not in SCENARIO_FIELDS:
+                raise ValueError(f"price_scenarios : paramètre de scénario inconnu '{name}'.")
+            params[name][s] = float(value)
+    if np.any(params["S0"] <= 0.0) or np.any(params["sigma"] <= 0.0) or np.any(params["T"] <= 0.0):
+        raise ValueError("price_scenarios : S0, sigma et T doivent être strictement positifs.")
+
+    # --- Dividende de chaque scénario (partie fixe calculée sur son S0) ---
+    t_div = np.full(n, -1.0)
+    div_fixed = np.zeros(n)
+    div_prop = np.zeros(n)
+    if market.has_dividend():
+        t, policy = market.dividends[0]  # Unique ex-div dans ce projet
+        t_div[:] = t
+        for s in range(n):
+            div_fixed[s], div_prop[s] = policy.coefficients(t, params["S0"][s])
+
+    # --- Regroupement des scénarios partageant un treillis ---
+    groups = {}
+    for s in range(n):
+        key = (params["r"][s], params["sigma"][s], params["T"][s])
+        if div_fixed[s] != 0.0:
+            key += (params["S0"][s],)
+        groups.setdefault(key, []).append(s)
+    order = np.array([s for members in groups.values() for s in members], dtype=np.int64)
+    group_start = np.cumsum([0] + [len(members) for members in groups.values()]).astype(np.int64)
+
+    prices = np.empty(n, dtype=np.float64)
+    _scenario_kernel(group_start, order, params["S0"], params["r"], params["sigma"], params["T"],
+                     t_div, div_fixed, div_prop, N, float(option.K), option.is_call,
+                     exercise.lower() == "american", float(band_threshold or 0.0), prices)
+    return prices
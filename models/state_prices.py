@@ -0,0 +1,109 @@
+import numpy as np
+from numba import njit
+from models.payoffs import call_payoff, put_payoff
+
+
+@njit(fastmath=True, cache=True)
+def _forward_state_prices(step_proba, proba_offset, node_proba, node_kprime, k_lo, k_hi, df, Q):
+    """
+    Induction vers l’avant des prix d’Arrow-Debreu : Q[j] est la valeur
+    actualisée d’un titre payant 1 au noeud j de la bande du niveau courant.
+    Chaque pas envoie Q · p · df vers les enfants k-1, k, k+1 (k′-1, k′,
+    k′+1 sur un pas avec dividende) ; la masse envoyée hors de la bande du
+    niveau suivant (élagué) est perdue.
+
+    Seules deux colonnes de taille 2N+1 sont utilisées ; Q contient en
+    sortie les prix d’état du niveau de maturité.
+    """
+    N = len(k_lo) - 1
+    Q_next = np.zeros(len(Q))
+    Q[0] = 1.0
+
+    for i in range(N):
+        offset = proba_offset[i]
+        shift = k_lo[i] - 1 - k_lo[i + 1]
+        next_width = k_hi[i + 1] - k_lo[i + 1] + 1
+        pD, pM, pU = step_proba[i, 0], step_proba[i, 1], step_proba[i, 2]
+
+        Q_next[:next_width] = 0.0
+        for j in range(k_hi[i] - k_lo[i] + 1):
+            c = j + shift
+            if offset >= 0:
+                pD = node_proba[offset + j, 0]
+                pM = node_proba[offset + j, 1]
+                pU = node_proba[offset + j, 2]
+                c = node_kprime[offset + j] - 1 - k_lo[i + 1]
+
+            q = Q[j] * df
+            if 0 <= c < next_width:
+                Q_next[c] += q * pD
+            if 0 <= c + 1 < next_width:
+                Q_next[c + 1] += q * pM
+            if 0 <= c + 2 < next_width:
+                Q_next[c + 2] += q * pU
+
+        Q[:next_width] = Q_next[:next_width]
+
+
+class StatePriceEngine:
+    """
+    Prix d’Arrow-Debreu à maturité sur un arbre trinomial construit.
+
+    Une seule induction vers l’avant en O(N²) donne le prix actualisé de
+    chaque état terminal ; toute option européenne (strike ou payoff
+    quelconque) se price ensuite en O(N), sans récurrence arrière.
+    Seuls les tableaux par pas de l’arbre sont utilisés : un arbre
+    implicite ou élagué convient.
+    """
+
+    def __init__(self, tree):
+        """
+        Calcule les prix d’état du niveau de maturité.
+
+        Paramètres
+        ----------
+        tree : TrinomialTree
+            Arbre trinomial déjà construit.
+        """
+        N = tree.N
+        Q = np.zeros(2 * N + 1, dtype=np.float64)
+        _forward_state_prices(tree.step_proba, tree.proba_offset, tree.node_proba,
+                              tree.node_kprime, tree.k_lo, tree.k_hi, tree.df, Q)
+
+        width = int(tree.k_hi[N] - tree.k_lo[N] + 1)
+        k = np.arange(tree.k_lo[N], tree.k_hi[N] + 1)
+        self.state_prices = Q[:width].copy()                        # Arrow-Debreu à maturité
+        self.terminal_prices = tree.trunk[N] * np.exp(tree.log_alpha * k)  # Sous-jacent à maturité
+
+    def price_payoff(self, payoff):
+        """
+        Prix d’une option européenne de payoff quelconque.
+
+        Paramètres
+        ----------
+        payoff : callable
+            Fonction vectorisée S (np.ndarray) -> payoff (np.ndarray).
+        """
+        return float(self.state_prices @ payoff(self.terminal_prices))
+
+    def price_european_strip(self, strikes, is_call=True):
+        """
+        Prix d’une série d’options européennes vanilles, en O(N) par strike.
+
+        Paramètres
+        ----------
+        strikes : array-like
+            Strikes à évaluer.
+        is_call : bool ou array-like
+            Type de chaque option (commun ou par strike).
+
+        Retour
+        ------
+        np.ndarray
+            Prix de chaque option, dans l’ordre de strikes.
+        """
+        K = np.atleast_1d(np.asarray(strikes, dtype=np.float64))[:, None]
+        calls = np.broadcast_to(np.asarray(is_call, dtype=np.bool_), K.shape[:1])[:, None]
+        S = self.terminal_prices[None, :]
+        payoffs = np.where(calls, call_payoff(S, K), put_payoff(S, K))
+        return payoffs @ self.state_prices
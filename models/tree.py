@@ -1,16 +1,36 @@
 import math
-from models.node import Node
+import numpy as np
 from models.option_trade import Option
 from models.pruning import compute_reach_probabilities, prune_tree
-from utils.utils_dividends import get_dividend_on_step
-from utils.utils_constants import MIN_P
-from models.probabilities import local_probabilities
+from models.tree_builder import build_layout, build_lattice, build_reach_cone
+from utils.utils_dividends import get_dividend_schedule
 
 
 class TrinomialTree:
     """
     Classe principale pour la construction et la gestion d’un arbre trinomial.
-    Chaque noeud de l’arbre est une instance de Node
+
+    L’arbre est stocké en « structure of arrays » : chaque grandeur nodale
+    (prix du sous-jacent, p_reach, valeur d’option) vit dans un tableau
+    NumPy plat et contigu. Le niveau i contient les noeuds de la bande
+    k = k_lo[i]..k_hi[i] et commence à l’offset level_offset[i], de sorte
+    que le noeud (i, k) est à l’indice level_offset[i] + k - k_lo[i].
+    Sans élagage, la bande est complète (k = -i..i). L’élagage (à la
+    construction ou par prune_tree) ne fait que resserrer les bandes : tous
+    les noeuds stockés sont vivants, il n’y a ni masque ni trou.
+
+    Enfants en bord de bande : les enfants du noeud (i, k) sont k-1, k, k+1
+    au niveau i+1. Un enfant hors de la bande du niveau i+1 (élagué) vaut 0
+    dans la récurrence arrière, et la masse de probabilité qui lui est
+    envoyée est perdue dans la propagation des p_reach.
+
+    Les probabilités locales sont stockées par pas : un triplet unique
+    (step_proba) pour les pas sans dividende, et des probabilités par noeud
+    (node_proba) uniquement pour les pas avec dividende.
+
+    En mode storage="implicit", aucun tableau par noeud n’est alloué : seuls
+    le tronc, alpha et les probabilités par pas sont conservés, et le prix
+    du noeud (i, k) est recalculé à la demande comme trunk[i] · alpha^k.
 
     L’arbre est utilisé pour :
       - le calcul des prix d’options par récurrence (backward/recursive)
@@ -18,7 +38,9 @@ class TrinomialTree:
       - l’affichage des niveaux dans Excel
     """
 
-    def __init__(self, market, option: Option, N: int, exercise="european"):
+    def __init__(self, market, option: Option, N: int, exercise="european", storage="full",
+                 band_threshold=None, truncation_tol=None, smoothing=False, context=None,
+                 lead_steps=0):
         """
         Initialise les paramètres du modèle trinomial.
 
@@ -32,17 +54,55 @@ class TrinomialTree:
             Nombre d’étapes temporelles de l’arbre.
         exercise : str
             Type d’option ("european" ou "american").
+        storage : str
+            "full" (tableaux par noeud) ou "implicit" (aucun stockage par
+            noeud, pour les très grands N).
+        band_threshold : float ou None
+            Si fourni, seuls les noeuds dont la probabilité d’atteinte
+            dépasse ce seuil sont construits (élagage à la construction).
+        truncation_tol : float ou None
+            Si fourni, active la troncature par valeur : les régions où la
+            valeur est déterminée (nulle hors de la monnaie, égale au payoff
+            dans la région d’exercice américaine) ne sont plus évaluées.
+            La borne d’erreur acceptée est rapportée dans truncation_error.
+        smoothing : bool
+            Si vrai, la valeur de continuation du dernier pas est remplacée
+            par le prix Black-Scholes sur dt (lissage du payoff).
+        context : PricingContext ou None
+            Espace de travail réutilisable : les tableaux de l’arbre et les
+            tampons du pricing y sont pris au lieu d’être alloués
+            (contexte dimensionné pour N + lead_steps pas).
+        lead_steps : int
+            Nombre de pas ajoutés avant la date de pricing : l’arbre compte
+            N + lead_steps pas de même dt = T / N, sa racine est en
+            S0 · exp(-r · lead_steps · dt) et le niveau lead_steps est centré
+            sur S0 (lecture des Greeks sur l’arbre, voir lattice_greeks).
         """
+        if lead_steps < 0:
+            raise ValueError("TrinomialTree: lead_steps doit être positif.")
         self.market = market
         self.option = option
-        self.N = N
+        self.lead_steps = lead_steps
+        self.N = N + lead_steps
         self.exercise = exercise.lower()
+        self.storage = storage.lower()
+        if self.storage not in ("full", "implicit"):
+            raise ValueError(f"TrinomialTree: mode de stockage inconnu '{storage}'.")
+        self.implicit = (self.storage == "implicit")
+        self.band_threshold = band_threshold
+        self.truncation_tol = truncation_tol
+        self.smoothing = smoothing
+        self.context = context
+        if context is not None:
+            context.check(self.N)
 
-        # Paramètres du marché 
-        self.dt = market.T / N             
-        self.r = market.r                   
-        self.sigma = market.sigma           
-        self.df = math.exp(-self.r * self.dt)  
+        # Paramètres du marché
+        self.dt = market.T / N
+        self.r = market.r
+        self.sigma = market.sigma
+        self.df = math.exp(-self.r * self.dt)
+        self.t_start = -lead_steps * self.dt                          # Date du niveau 0
+        self.S_root = market.S0 * math.exp(self.r * self.t_start)     # Prix à la racine
 
         #  Paramètres du modèle trinomial
         self.alpha = math.exp(self.sigma * math.sqrt(3.0 * self.dt))  # facteur de hausse
@@ -50,99 +110,262 @@ class TrinomialTree:
         self.log_alpha = math.log(self.alpha)
         self.exp_r_dt = math.exp(self.r * self.dt)
 
-        # Structures internes
-        self.tree = []         # Arbre complet (liste de listes de Node)
-        self.proba_tree = []   # Liste des probabilités locales pour chaque niveau
-        self.trunk = [0.0] * (self.N + 1)  # Prix médian par étape
+        # Structures internes (tableaux plats, alloués par build_tree)
+        self.k_lo = None           # Bande de noeuds construits par niveau
+        self.k_hi = None
+        self.level_offset = None   # (N+2) : début de chaque niveau
+        self.n_nodes = 0
+        self.stock_price = None    # Prix du sous-jacent par noeud
+        self.step_proba = None     # (N, 3) : triplet constant par pas
+        self.proba_offset = None   # (N) : offset dans node_proba, -1 si constant
+        self.node_proba = None     # (M, 3) : probabilités des pas avec dividende
+        self.node_kprime = None    # (M) : enfants en k′-1, k′, k′+1 (pas avec dividende)
+        self.p_reach = None        # Calculé à la demande (pruning, affichage)
+        self.option_value = None   # Alloué par le pricing backward
+        self.trunk = self._buffer("trunk", self.N + 1)  # Prix médian par étape
+        self.div_step = None       # (N) : dividende versé sur chaque pas
+        self.cone_lo = None        # (N+1) : bornes du cône atteignable (à k = 0)
+        self.cone_hi = None
+        self.truncation_error = 0.0  # Borne d’erreur de la troncature par valeur
+        self.exercise_boundary = None  # (N+1) : frontière d’exercice S*(t_i), américain
+        self.head_values = None        # Valeurs des premiers niveaux (voir price_backward)
+
+    def _buffer(self, name: str, shape, dtype=np.float64) -> np.ndarray:
+        """
+        Tableau de l’arbre (non initialisé) : pris dans le PricingContext
+        s’il y en a un, alloué sinon.
+        """
+        if self.context is None:
+            return np.empty(shape, dtype=dtype)
+        return self.context.buffer(name, shape, dtype)
+
+    def level_slice(self, i: int) -> slice:
+        """
+        Renvoie la tranche des tableaux plats correspondant au niveau i.
+        """
+        return slice(self.level_offset[i], self.level_offset[i + 1])
+
+    def node_index(self, i: int, k: int) -> int:
+        """
+        Renvoie l’indice plat du noeud (i, k), k étant relatif au tronc.
+        """
+        return self.level_offset[i] + k - self.k_lo[i]
+
+    def in_band(self, i: int, k: int) -> bool:
+        """
+        Indique si le noeud (i, k) fait partie des noeuds construits.
+        """
+        return self.k_lo[i] <= k <= self.k_hi[i]
 
     def build_tree(self):
         """
-        Construit l’arbre trinomial en 3 étapes :
-          1. Création du noeud racine.
-          2. Construction progressive des niveaux de prix.
-          3. Calcul des probabilités locales p_down, p_mid, p_up.
+        Construit l’arbre trinomial via les noyaux compilés :
+          1. build_layout : échéancier des dividendes, tronc, probabilités
+             des pas sans dividende et bande de noeuds de chaque niveau
+             (élagage à la construction si band_threshold est fourni).
+          2. build_lattice : prix des noeuds et probabilités locales des
+             pas avec dividende, sur la bande uniquement.
+
+        Connectivité : sur un pas sans dividende, les enfants du noeud
+        (i, k) sont k-1, k, k+1 ; sur un pas avec dividende, ils sont
+        recentrés en k′-1, k′, k′+1 (node_kprime, rangé comme node_proba).
+        Tous les noyaux parcourent l’arbre à travers cette connectivité.
         """
-        S0 = self.market.S0
-        dt, r = self.dt, self.r
-        exp_r_dt = self.exp_r_dt
-        alpha, log_alpha = self.alpha, self.log_alpha
-        exp_sig2_dt = self.exp_sig2_dt
         N = self.N
+        has_div, div_fixed, div_prop = get_dividend_schedule(
+            self.market, N, self.dt,
+            out=(self._buffer("has_div", N, np.bool_), self._buffer("div_fixed", N),
+                 self._buffer("div_prop", N)),
+            t_start=self.t_start,
+        )
+
+        self.step_proba = self._buffer("step_proba", (N, 3))
+        self.step_proba[:] = 0.0
+        self.k_lo = self._buffer("k_lo", N + 1, np.int64)
+        self.k_hi = self._buffer("k_hi", N + 1, np.int64)
+        build_layout(
+            float(self.S_root), N, self.alpha, self.log_alpha,
+            self.exp_r_dt, self.exp_sig2_dt,
+            has_div, div_fixed, div_prop, float(self.band_threshold or 0.0),
+            self.trunk, self.step_proba, self.k_lo, self.k_hi,
+            self._buffer("reach", (2, 2 * N + 1)),
+        )
+
+        widths = self.k_hi - self.k_lo + 1
+        self.level_offset = self._buffer("level_offset", N + 2, np.int64)
+        self.level_offset[0] = 0
+        np.cumsum(widths, out=self.level_offset[1:])
+        self.n_nodes = int(self.level_offset[-1])
+
+        # div_fixed et div_prop sont nuls hors des pas avec dividende
+        self.div_step = self._buffer("div_step", N)
+        np.multiply(div_prop, self.trunk[:-1], out=self.div_step)
+        self.div_step += div_fixed
+
+        # Seuls les pas avec dividende stockent des probabilités par noeud
+        div_widths = np.where(has_div, widths[:-1], 0)
+        self.proba_offset = self._buffer("proba_offset", N, np.int64)
+        self.proba_offset[:] = np.where(has_div, np.cumsum(div_widths) - div_widths, -1)
+        n_div_nodes = int(div_widths.sum())
+
+        self.stock_price = self._buffer("stock_price", 0 if self.implicit else self.n_nodes)
+        self.node_proba = self._buffer("node_proba", (n_div_nodes, 3))
+        self.node_kprime = self._buffer("node_kprime", n_div_nodes, np.int64)
+        self.p_reach = None
+        self.option_value = None
+        self.truncation_error = 0.0
+        self.exercise_boundary = None
+        self.head_values = None
+
+        build_lattice(
+            N, self.alpha, self.log_alpha, self.exp_r_dt, self.exp_sig2_dt,
+            has_div, div_fixed, div_prop, self.trunk, self.k_lo, self.level_offset,
+            self.proba_offset, self.stock_price, self.node_proba, self.node_kprime,
+        )
+
+        self.cone_lo = self._buffer("cone_lo", N + 1)
+        self.cone_hi = self._buffer("cone_hi", N + 1)
+        build_reach_cone(self.trunk, self.alpha, self.k_lo, self.k_hi, self.proba_offset,
+                         self.node_kprime, self.cone_lo, self.cone_hi)
+
+    def stock(self, i: int, k: int) -> float:
+        """
+        Renvoie le prix du sous-jacent au noeud (i, k).
+        """
+        if self.implicit:
+            return self.trunk[i] * math.exp(self.log_alpha * k)
+        return self.stock_price[self.node_index(i, k)]
+
+    def node_active(self, i: int, k: int) -> bool:
+        """
+        Indique si le noeud (i, k) est conservé (dans la bande de son niveau).
+        """
+        return self.in_band(i, k)
+
+    def out_of_reach(self, i: int, k: int) -> bool:
+        """
+        Indique si aucun noeud atteignable depuis (i, k) n’est dans la
+        monnaie : la valeur du noeud est alors exactement nulle.
+        """
+        scale = math.exp(self.log_alpha * k)
+        if self.option.is_call:
+            return scale * self.cone_hi[i] <= self.option.K
+        return scale * self.cone_lo[i] >= self.option.K
+
+    def _require_storage(self, what: str):
+        """
+        Lève une erreur si l’opération nécessite les tableaux par noeud.
+        """
+        if self.implicit:
+            raise ValueError(f"TrinomialTree: {what} indisponible en mode implicite.")
+
+    def level_probabilities(self, i: int):
+        """
+        Renvoie (p_down, p_mid, p_up) pour le niveau i : des scalaires si le
+        pas est sans dividende, des tableaux de la largeur de la bande sinon.
+        Les deux formes se combinent directement avec les tableaux du niveau.
+        """
+        offset = self.proba_offset[i]
+        if offset < 0:
+            pD, pM, pU = self.step_proba[i]
+            return pD, pM, pU
+        P = self.node_proba[offset:offset + self.k_hi[i] - self.k_lo[i] + 1]
+        return P[:, 0], P[:, 1], P[:, 2]
+
+    def probabilities(self, i: int, k: int):
+        """
+        Renvoie (p_down, p_mid, p_up) pour le noeud (i, k).
+        """
+        offset = self.proba_offset[i]
+        if offset < 0:
+            pD, pM, pU = self.step_proba[i]
+        else:
+            pD, pM, pU = self.node_proba[offset + k - self.k_lo[i]]
+        return pD, pM, pU
+
+    def restrict_bands(self, k_lo, k_hi):
+        """
+        Resserre la bande de chaque niveau sur [k_lo[i], k_hi[i]] (incluse
+        dans la bande actuelle) et compacte les tableaux par noeud
+        (prix, probabilités des pas avec dividende, p_reach, valeurs).
+        """
+        self._require_storage("la restriction des bandes")
+        widths = k_hi - k_lo + 1
+        level_offset = np.zeros(self.N + 2, dtype=np.int64)
+        np.cumsum(widths, out=level_offset[1:])
+
+        # Indice dans les anciens tableaux de chaque noeud conservé
+        levels = np.repeat(np.arange(self.N + 1), widths)
+        keep = (np.arange(level_offset[-1]) - level_offset[levels]
+                + self.level_offset[levels] + k_lo[levels] - self.k_lo[levels])
+
+        # Probabilités par noeud des pas avec dividende
+        has_div = self.proba_offset >= 0
+        div_widths = np.where(has_div, widths[:-1], 0)
+        proba_offset = np.where(has_div, np.cumsum(div_widths) - div_widths, -1)
+        div_levels = np.repeat(np.arange(self.N), div_widths)
+        keep_proba = (np.arange(div_widths.sum()) - proba_offset[div_levels]
+                      + self.proba_offset[div_levels] + k_lo[div_levels] - self.k_lo[div_levels])
+
+        self.stock_price = self.stock_price[keep]
+        self.node_proba = self.node_proba[keep_proba]
+        self.node_kprime = self.node_kprime[keep_proba]
+        if self.p_reach is not None:
+            self.p_reach = self.p_reach[keep]
+        if self.option_value is not None:
+            self.option_value = self.option_value[keep]
 
-        # Création du noeud racine
-        root = Node.create(0, S0)
-        self.tree = [[root]]
-        self.trunk[0] = S0
-
-        # Construction des niveaux suivants
-        for i in range(1, N + 1):
-            prev_mid = self.trunk[i - 1]
-            t_i, t_ip1 = (i - 1) * dt, i * dt
-
-            div, has_dividend = get_dividend_on_step(self.market, t_i, t_ip1, prev_mid)
-
-            # Calcul du prix médian du niveau suivant
-            mid_i = prev_mid * exp_r_dt - div
-            if mid_i < MIN_P:
-                mid_i = MIN_P
-            self.trunk[i] = mid_i
-
-            # Création des noeuds du niveau i
-            level_nodes = []
-            for k in range(-i, i + 1):
-                S = mid_i * math.exp(log_alpha * k)
-                node = Node.create(i, S)
-                level_nodes.append(node)
-            self.tree.append(level_nodes)
-
-        # Calcul des probabilités locales
-        self.proba_tree = []
-        for i, level in enumerate(self.tree[:-1]): 
-            t_i, t_ip1 = i * dt, (i + 1) * dt
-            level_proba = []
-
-            # Référence médiane du niveau
-            mid_ref = self.trunk[i]
-            div, has_dividend = get_dividend_on_step(self.market, t_i, t_ip1, mid_ref)
-            trunk_next = self.trunk[i + 1]
-
-            # Calcul des probabilités locales pour chaque noeud
-            for node in level:
-                S = node.stock_price
-                pD, pM, pU, kprime = local_probabilities(
-                    S_i_k=S,
-                    i=i,
-                    dt=dt,
-                    r=r,
-                    a=alpha,
-                    exp_sig2_dt=exp_sig2_dt,
-                    trunk_next=trunk_next,
-                    div=div,
-                    has_dividend=has_dividend,
-                )
-                # Sauvegarde des probabilités dans le nœud
-                node.p_down, node.p_mid, node.p_up = pD, pM, pU
-                level_proba.append((pD, pM, pU, kprime))
-
-            self.proba_tree.append(level_proba)
+        self.k_lo = np.asarray(k_lo, dtype=np.int64)
+        self.k_hi = np.asarray(k_hi, dtype=np.int64)
+        self.level_offset = level_offset
+        self.proba_offset = proba_offset
+        self.n_nodes = int(level_offset[-1])
 
     def compute_reach_probabilities(self):
         """
         Calcule les probabilités d’atteinte p_reach pour chaque noeud
         en appelant la fonction de propagation dédiée.
         """
+        self._require_storage("le calcul des p_reach")
         compute_reach_probabilities(self)
 
     def prune_tree(self, threshold=1e-7):
         """
         Supprime les noeuds dont la probabilité d’atteinte p_reach
-        est inférieure à un seuil donné.
+        est inférieure à un seuil donné, en resserrant la bande de chaque
+        niveau (p_reach calculées au préalable si nécessaire).
         """
+        self._require_storage("le pruning")
         prune_tree(self, threshold)
 
-    def to_levels_for_excel(self):
+    def to_levels_for_excel(self, attr: str):
         """
-        Renvoie l’arbre sous une forme compatible avec display_trees(),
-        pour affichage dans Excel.
+        Renvoie la grandeur nodale `attr` niveau par niveau (liste de listes),
+        avec None hors de la bande (noeuds élagués) ou pour une grandeur non
+        calculée, pour display_trees().
+        Les p_reach sont calculées à la demande si elles ne l’ont pas été.
         """
-        return self.tree
+        self._require_storage("l’affichage de l’arbre")
+        if attr == "p_reach" and self.p_reach is None:
+            self.compute_reach_probabilities()
+        proba_cols = {"p_down": 0, "p_mid": 1, "p_up": 2}
+        values = getattr(self, attr, None)
+        levels = []
+        for i in range(self.N + 1):
+            level = [None] * (2 * i + 1)
+            levels.append(level)
+            sl = self.level_slice(i)
+            width = sl.stop - sl.start
+            if attr in proba_cols:
+                if i == self.N:
+                    band = np.zeros(width)
+                else:
+                    p = self.level_probabilities(i)[proba_cols[attr]]
+                    band = np.broadcast_to(p, (width,))
+            elif values is None:
+                continue
+            else:
+                band = values[sl]
+            start = self.k_lo[i] + i
+            level[start:start + width] = [float(v) for v in band]
+        return levels
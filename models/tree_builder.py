@@ -0,0 +1,230 @@
+import math
+from numba import njit
+from models.probabilities import node_probabilities
+from utils.utils_constants import MIN_P, REACH_MARGIN
+
+
+@njit(fastmath=True, cache=True)
+def build_trunk(S0, N, exp_r_dt, has_div, div_fixed, div_prop, trunk):
+    """
+    Remplit trunk (N+1) avec le prix médian de chaque niveau, ajusté du
+    dividende versé sur le pas précédent.
+    """
+    trunk[0] = S0
+    for i in range(1, N + 1):
+        prev_mid = trunk[i - 1]
+        div = div_fixed[i - 1] + div_prop[i - 1] * prev_mid if has_div[i - 1] else 0.0
+        mid_i = prev_mid * exp_r_dt - div
+        if mid_i < MIN_P:
+            mid_i = MIN_P
+        trunk[i] = mid_i
+
+
+@njit(fastmath=True, cache=True)
+def build_layout(S0, N, alpha, log_alpha, exp_r_dt, exp_sig2_dt,
+                 has_div, div_fixed, div_prop, band_threshold,
+                 trunk, step_proba, k_lo, k_hi, reach_buf):
+    """
+    Première passe de construction, en mémoire O(N) : tronc, triplets de
+    probabilités des pas sans dividende et bande de noeuds conservés
+    [k_lo[i], k_hi[i]] de chaque niveau.
+
+    Si band_threshold > 0, la distribution d’atteinte est propagée vers
+    l’avant pendant la construction et seuls les noeuds dont p_reach
+    atteint le seuil sont gardés : les noeuds élagables ne sont jamais
+    construits. Sinon la bande couvre tout le niveau (k = -i..i). Sur un
+    pas avec dividende, le noeud k envoie sa masse en k′-1, k′, k′+1 (k′
+    renvoyé par node_probabilities) ; tout le niveau suivant est alors
+    parcouru.
+
+    Paramètres
+    ----------
+    band_threshold : float
+        Seuil de probabilité d’atteinte (0 pour l’arbre complet).
+    trunk, step_proba, k_lo, k_hi : np.ndarray
+        Tableaux (N+1), (N, 3), (N+1), (N+1) remplis en place.
+    reach_buf : np.ndarray
+        Tampon (2, 2N+1) de la propagation de p_reach.
+    """
+    a2 = alpha * alpha
+    exp2r = exp_r_dt * exp_r_dt
+
+    build_trunk(S0, N, exp_r_dt, has_div, div_fixed, div_prop, trunk)
+
+    # Sur un pas sans dividende, les probabilités ne dépendent pas du noeud :
+    # un seul triplet est calculé au noeud du tronc.
+    for i in range(N):
+        if has_div[i]:
+            continue
+        pD, pM, pU, kp = node_probabilities(
+            trunk[i], i, alpha, a2, log_alpha,
+            exp_r_dt, exp2r, exp_sig2_dt, trunk[i + 1], 0.0, False,
+        )
+        step_proba[i, 0] = pD
+        step_proba[i, 1] = pM
+        step_proba[i, 2] = pU
+
+    if band_threshold <= 0.0:
+        for i in range(N + 1):
+            k_lo[i] = -i
+            k_hi[i] = i
+        return
+
+    # Propagation de p_reach (indice k + N) sur une bande élargie
+    # [s_lo, s_hi] : les noeuds sous le seuil mais au-dessus de
+    # band_threshold · REACH_MARGIN propagent encore leur masse, pour que la
+    # bande retenue coïncide avec un élagage après calcul sur l’arbre complet.
+    shadow_threshold = band_threshold * REACH_MARGIN
+    reach = reach_buf[0]
+    reach_next = reach_buf[1]
+    reach[:] = 0.0
+    reach[N] = 1.0
+    s_lo, s_hi = 0, 0
+    k_lo[0] = 0
+    k_hi[0] = 0
+
+    for i in range(N):
+        mid_ref = trunk[i]
+        div = div_fixed[i] + div_prop[i] * mid_ref if has_div[i] else 0.0
+        pD, pM, pU = step_proba[i, 0], step_proba[i, 1], step_proba[i, 2]
+
+        # Plage [t_lo, t_hi] du niveau i+1 pouvant recevoir de la masse
+        t_lo, t_hi = (-(i + 1), i + 1) if has_div[i] else (s_lo - 1, s_hi + 1)
+        for k in range(t_lo, t_hi + 1):
+            reach_next[k + N] = 0.0
+
+        for k in range(s_lo, s_hi + 1):
+            r = reach[k + N]
+            if has_div[i]:
+                pD, pM, pU, kp = node_probabilities(
+                    mid_ref * math.exp(log_alpha * k), i, alpha, a2, log_alpha,
+                    exp_r_dt, exp2r, exp_sig2_dt, trunk[i + 1], div, True,
+                )
+                if t_lo <= kp - 1 <= t_hi:
+                    reach_next[kp - 1 + N] += r * pD
+                if t_lo <= kp <= t_hi:
+                    reach_next[kp + N] += r * pM
+                if t_lo <= kp + 1 <= t_hi:
+                    reach_next[kp + 1 + N] += r * pU
+                continue
+            reach_next[k - 1 + N] += r * pD
+            reach_next[k + N] += r * pM
+            reach_next[k + 1 + N] += r * pU
+
+        # Bandes suivantes : premier et dernier noeuds au-dessus des seuils
+        lo, hi = t_hi + 1, t_lo - 1
+        new_s_lo, new_s_hi = t_hi + 1, t_lo - 1
+        best = t_lo
+        for k in range(t_lo, t_hi + 1):
+            r = reach_next[k + N]
+            if r >= band_threshold:
+                lo = min(lo, k)
+                hi = max(hi, k)
+            if r >= shadow_threshold:
+                new_s_lo = min(new_s_lo, k)
+                new_s_hi = max(new_s_hi, k)
+            if r > reach_next[best + N]:
+                best = k
+        if lo > hi:
+            lo, hi = best, best
+        k_lo[i + 1] = lo
+        k_hi[i + 1] = hi
+
+        for k in range(t_lo, t_hi + 1):
+            keep = new_s_lo <= k <= new_s_hi or lo <= k <= hi
+            reach[k + N] = reach_next[k + N] if keep else 0.0
+        s_lo, s_hi = min(new_s_lo, lo), max(new_s_hi, hi)
+
+
+@njit(fastmath=True, cache=True)
+def build_lattice(N, alpha, log_alpha, exp_r_dt, exp_sig2_dt,
+                  has_div, div_fixed, div_prop, trunk, k_lo, level_offset,
+                  proba_offset, stock_price, node_proba, node_kprime):
+    """
+    Seconde passe de construction : remplit les tableaux par noeud sur la
+    bande calculée par build_layout. Le noeud (i, k) est rangé à l’indice
+    level_offset[i] + k - k_lo[i].
+
+    Les prix des noeuds sont recalculés à la volée (trunk[i] · alpha^k) ;
+    ils ne sont écrits dans stock_price que si ce tableau est non vide
+    (mode "full"). Seuls les pas avec dividende ont des probabilités par
+    noeud, rangées dans node_proba à partir de proba_offset[i] (-1 pour un
+    pas sans dividende).
+
+    Paramètres
+    ----------
+    N : int
+        Nombre d’étapes temporelles.
+    alpha, log_alpha : float
+        Facteur de hausse et son logarithme.
+    exp_r_dt, exp_sig2_dt : float
+        exp(r·dt) et exp(sigma²·dt).
+    has_div, div_fixed, div_prop : np.ndarray
+        Échéancier des dividendes par pas (voir get_dividend_schedule).
+    trunk, k_lo, level_offset : np.ndarray
+        Tronc, borne basse de la bande et offset de chaque niveau.
+    proba_offset : np.ndarray
+        Offset de chaque pas dans node_proba, -1 si le pas est sans dividende.
+    stock_price : np.ndarray
+        Tableau plat des prix, ou tableau vide en mode implicite.
+    node_proba, node_kprime : np.ndarray
+        Probabilités (M, 3) et positions k′ (M) des noeuds des pas avec
+        dividende.
+    """
+    a2 = alpha * alpha
+    exp2r = exp_r_dt * exp_r_dt
+
+    # Prix des noeuds
+    if len(stock_price) > 0:
+        for i in range(N + 1):
+            offset = level_offset[i]
+            mid_i = trunk[i]
+            for j in range(level_offset[i + 1] - offset):
+                stock_price[offset + j] = mid_i * math.exp(log_alpha * (k_lo[i] + j))
+
+    # Probabilités locales des pas avec dividende
+    for i in range(N):
+        if proba_offset[i] < 0:
+            continue
+
+        mid_ref = trunk[i]
+        div = div_fixed[i] + div_prop[i] * mid_ref
+        base = proba_offset[i]
+        for j in range(level_offset[i + 1] - level_offset[i]):
+            pD, pM, pU, kp = node_probabilities(
+                mid_ref * math.exp(log_alpha * (k_lo[i] + j)), i, alpha, a2, log_alpha,
+                exp_r_dt, exp2r, exp_sig2_dt, trunk[i + 1], div, True,
+            )
+            node_proba[base + j, 0] = pD
+            node_proba[base + j, 1] = pM
+            node_proba[base + j, 2] = pU
+            node_kprime[base + j] = kp
+
+
+@njit(fastmath=True, cache=True)
+def build_reach_cone(trunk, alpha, k_lo, k_hi, proba_offset, node_kprime, cone_lo, cone_hi):
+    """
+    Bornes du cône des prix atteignables : depuis le noeud (i, k), tout
+    noeud atteignable aux niveaux j >= i a un prix compris entre
+    alpha^k · cone_lo[i] et alpha^k · cone_hi[i].
+
+    Le noeud (i, k) a ses enfants en k′ + d, d = -1, 0, 1, avec k′ = k sur
+    un pas sans dividende et k′ = node_kprime sinon ; en notant d_lo, d_hi
+    les bornes de k′ - k sur le pas, les bornes sont calculées de la
+    maturité vers la racine :
+    cone_hi[i] = max(trunk[i], cone_hi[i+1] · alpha^(d_hi + 1)) et
+    cone_lo[i] = min(trunk[i], cone_lo[i+1] · alpha^(d_lo - 1)).
+    """
+    N = len(trunk) - 1
+    cone_lo[N] = trunk[N]
+    cone_hi[N] = trunk[N]
+    for i in range(N - 1, -1, -1):
+        d_lo, d_hi = 0, 0
+        offset = proba_offset[i]
+        if offset >= 0:
+            for j in range(k_hi[i] - k_lo[i] + 1):
+                d = node_kprime[offset + j] - (k_lo[i] + j)
+                d_lo = min(d_lo, d)
+                d_hi = max(d_hi, d)
+        cone_lo[i] = min(trunk[i], cone_lo[i + 1] * alpha ** (d_lo - 1))
+        cone_hi[i] = max(trunk[i], cone_hi[i + 1] * alpha ** (d_hi + 1))
@@ -1,4 +1,6 @@
+import math
 from math import exp, sqrt, log
+from numba import njit
 from scipy.stats import norm
 
 
@@ -46,6 +48,32 @@ def bs_price(S, K, r, sigma, T, is_call=True):
     return price
 
 
+@njit(fastmath=True, cache=True)
+def norm_cdf(x):
+    """
+    Fonction de répartition de la loi normale centrée réduite (compatible Numba).
+    """
+    return 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
+
+
+@njit(fastmath=True, cache=True)
+def bs_price_nb(S, K, r, sigma, T, is_call):
+    """
+    Version compilée de bs_price, utilisable dans les noyaux Numba
+    (lissage du dernier pas de l’arbre). Pour S <= 0, renvoie la valeur
+    limite (0 pour un call, K·exp(-rT) - S pour un put).
+    """
+    df_r = math.exp(-r * T)
+    if S <= 0.0:
+        return 0.0 if is_call else K * df_r - S
+    vol = sigma * math.sqrt(T)
+    d_1 = (math.log(S / K) + (r + 0.5 * sigma * sigma) * T) / vol
+    d_2 = d_1 - vol
+    if is_call:
+        return S * norm_cdf(d_1) - K * df_r * norm_cdf(d_2)
+    return K * df_r * norm_cdf(-d_2) - S * norm_cdf(-d_1)
+
+
 def bs_greeks(S, K, r, sigma, T, is_call=True):
     """
     Calcule les principaux Greeks du modèle Black-Scholes (sans dividendes).
@@ -2,6 +2,11 @@ from numba import njit
 
 EPS = 1e-14
 MIN_P = 1e-12
+REACH_MARGIN = 1e-6   # Marge de propagation sous le seuil de pruning
+PARALLEL_MIN_WIDTH = 4096   # Largeur de niveau à partir de laquelle la récurrence est multi-thread
+BOUNDARY_MARGIN = 2   # Demi-largeur (en noeuds) de la fenêtre comparée autour de la frontière d’exercice
+GREEK_LEAD_STEPS = 2  # Pas ajoutés avant t = 0 pour lire Delta, Gamma et Theta sur l’arbre
+RICHARDSON_SAFETY = 5.0   # Facteur de sécurité sur l’écart entre extrapolations de Richardson
 
 @njit(fastmath=True, cache=True)
 def clip_and_normalize(pD, pM, pU):
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def get_dividend_on_step(market, t_i: float, t_ip1: float, S: float):
     """
     Vérifie s’il existe un dividende sur l’intervalle [t_i, t_{i+1})
@@ -13,3 +16,35 @@ def get_dividend_on_step(market, t_i: float, t_ip1: float, S: float):
             has_dividend = True
 
     return div, has_dividend
+
+
+def get_dividend_schedule(market, N: int, dt: float, out=None, t_start: float = 0.0):
+    """
+    Construit l’échéancier des dividendes sur les N pas de l’arbre.
+
+    Retourne trois tableaux de taille N (pas i = [t_i, t_{i+1})) :
+      - has_div : True si un dividende tombe sur le pas
+      - div_fixed, div_prop : coefficients du montant, div = fixed + prop * S
+    Si out est fourni, ces trois tableaux y sont remplis en place.
+    t_start est la date du premier niveau (négative si l’arbre commence
+    avant la date de pricing).
+    """
+    if out is None:
+        has_div = np.zeros(N, dtype=np.bool_)
+        div_fixed = np.zeros(N, dtype=np.float64)
+        div_prop = np.zeros(N, dtype=np.float64)
+    else:
+        has_div, div_fixed, div_prop = out
+        has_div[:] = False
+        div_fixed[:] = 0.0
+        div_prop[:] = 0.0
+
+    if market.has_dividend():
+        t_div, policy = market.dividends[0]  # Unique ex-div dans ce projet
+        steps = t_start + np.arange(N + 1) * dt
+        has_div[:] = (steps[:-1] < t_div) & (t_div < steps[1:])
+        fixed, prop = policy.coefficients(t_div, market.S0)
+        div_fixed[has_div] = fixed
+        div_prop[has_div] = prop
+
+    return has_div, div_fixed, div_prop
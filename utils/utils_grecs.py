@@ -1,25 +1,94 @@
-from typing import Callable
+from typing import Callable, Dict
 
-class OneDimDerivative:
+
+class MultiDimDerivative:
     """
-    Classe utilitaire pour calculer les dérivées numériques (1re et 2e)
-    d’une fonction à une variable, en utilisant la méthode des différences finies
+    Dérivées numériques d’une fonction de plusieurs paramètres nommés
+    (différences finies centrées), adossées à un cache d’évaluations indexé
+    par le vecteur de paramètres bumpé : chaque point n’est évalué qu’une
+    fois, quel que soit le nombre de dérivées qui l’utilisent.
     """
 
-    def __init__(self, function: Callable[[object, float], float], other_parameters: object, shift: float = 1e-4):
-        self.f = function               # Fonction à dériver
-        self.param = other_parameters   # Paramètres additionnels fixes
-        self.shift = shift              # Pas de variation utilisé pour les différences finies
+    def __init__(self, function: Callable[[Dict[str, float]], float], base: Dict[str, float],
+                 shifts: Dict[str, float]):
+        """
+        Paramètres
+        ----------
+        function : callable
+            Fonction d’un dictionnaire {paramètre: valeur} vers un float.
+        base : dict
+            Point de dérivation.
+        shifts : dict
+            Pas par défaut de chaque paramètre.
+        """
+        self.f = function
+        self.names = tuple(base)
+        self.base = dict(base)
+        self.shifts = dict(shifts)
+        self.cache = {}          # Valeurs déjà calculées, par vecteur de paramètres
+        self.evaluations = 0     # Nombre d’appels effectifs à la fonction
+
+    def seed(self, value: float, **offsets):
+        """
+        Enregistre une valeur déjà connue (par exemple le prix de base).
+        """
+        self.cache.setdefault(self._key(offsets), value)
+
+    def value(self, **offsets) -> float:
+        """
+        Évalue la fonction au point base + offsets, sans recalcul si ce
+        point a déjà été évalué.
+        """
+        key = self._key(offsets)
+        if key not in self.cache:
+            self.cache[key] = self.f(dict(zip(self.names, key)))
+            self.evaluations += 1
+        return self.cache[key]
 
-    def first(self, x: float) -> float:
+    def first(self, name: str, shift: float = None, richardson: bool = False) -> float:
         """
-        Calcule la dérivée première
+        Dérivée première par rapport à name.
         """
-        return (self.f(self.param, x + self.shift) - self.f(self.param, x - self.shift)) / (2 * self.shift)
-    
-    def second(self, x: float) -> float:
+        d = lambda h: (self.value(**{name: h}) - self.value(**{name: -h})) / (2 * h)
+        return self._refine(d, name, shift, richardson)
+
+    def second(self, name: str, shift: float = None, richardson: bool = False) -> float:
+        """
+        Dérivée seconde par rapport à name.
         """
-        Calcule la dérivée seconde
+        d = lambda h: (self.value(**{name: h}) - 2 * self.value() + self.value(**{name: -h})) / (h ** 2)
+        return self._refine(d, name, shift, richardson)
+
+    def cross(self, a: str, b: str, shift_a: float = None, shift_b: float = None) -> float:
         """
-        return (self.f(self.param, x + self.shift) - 2 * self.f(self.param, x) + self.f(self.param, x - self.shift)) / (self.shift ** 2)
-    
\ No newline at end of file
+        Dérivée croisée ∂²f / ∂a∂b (grille centrée à quatre points).
+        """
+        ha = self.shifts[a] if shift_a is None else shift_a
+        hb = self.shifts[b] if shift_b is None else shift_b
+        return (self.value(**{a: ha, b: hb}) - self.value(**{a: ha, b: -hb})
+                - self.value(**{a: -ha, b: hb}) + self.value(**{a: -ha, b: -hb})) / (4 * ha * hb)
+
+    def _refine(self, d, name, shift, richardson):
+        """
+        Applique la différence finie d au pas demandé, avec extrapolation de
+        Richardson si demandé.
+        """
+        h = self.shifts[name] if shift is None else shift
+        return _richardson(d, h) if richardson else d(h)
+
+    def _key(self, offsets) -> tuple:
+        """
+        Vecteur de paramètres du point base + offsets (clé du cache).
+        """
+        for name in offsets:
+            if name not in self.base:
+                raise ValueError(f"MultiDimDerivative : paramètre inconnu '{name}'.")
+        return tuple(self.base[name] + offsets.get(name, 0.0) for name in self.names)
+
+
+def _richardson(d, h):
+    """
+    Extrapolation de Richardson d’une différence finie centrée (erreur en
+    h²) : (4 d(h/2) - d(h)) / 3.
+    """
+    return (4 * d(h / 2) - d(h)) / 3